@@ -0,0 +1,163 @@
+"""
+Author: Nicolas Fecko
+
+Description: Batch mode for Alter. Reads prompts from a JSONL file, builds every prompt with the same persona
+and context logic as the app (get_context), and runs them against one or more Ollama servers with a fixed
+number in flight, so the servers stay busy without being flooded. Results are written as JSONL the
+moment each one finishes, with timings per item.
+
+Usage:
+    python alter_batch.py prompts.jsonl -o results.jsonl --concurrency 8
+    python alter_batch.py prompts.jsonl --host http://gpu1:11434 --host http://gpu2:11434 --no-memory
+
+Input lines:  {"id": "q1", "prompt": "Tell me a joke", "language": "Slovak"}   (id and language optional)
+              "Just a prompt as a JSON string"
+Output lines: {"index", "id", "prompt", "language", "ok", "reply" or "error", "model",
+               "queued_s", "first_token_s", "total_s", "prompt_tokens", "eval_tokens"}
+"""
+# --- imports ---
+import argparse # For command line options
+import json     # For the JSONL files
+import sys      # For stdin / stdout
+import threading    # Results are written from the worker threads
+import time     # For per item timing
+from concurrent.futures import ThreadPoolExecutor   # For the workers
+from alter_engine import AlterEngine, GenerationBackend, MEMORY_FILE, SETTINGS_FILE, load_json # The headless core
+from metrics import metrics # For the summary at the end
+
+BATCH_CONCURRENCY = 2   # requests in flight per Ollama host
+
+
+def read_items(lines):
+    # Yields (index, item or None, error), one per non empty line
+    for index, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            yield index, None, f"bad JSON: {e}"
+            continue
+        if isinstance(item, str):
+            item = {"prompt": item}
+        if not isinstance(item, dict) or not str(item.get("prompt", "")).strip():
+            yield index, None, "needs a \"prompt\""
+            continue
+        yield index, item, None
+
+
+class BatchRunner:
+    def __init__(self, engine, out, concurrency):
+        self.engine = engine
+        self.out = out
+        self.concurrency = concurrency
+        self.write_lock = threading.Lock()
+        self.prefixes = {}      # language -> persona + summary + history, built once per language
+        self.prefix_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(concurrency * 2)    # reads ahead a little, never the whole file
+        self.done = 0
+        self.failed = 0
+
+    def prefix(self, language):
+        with self.prefix_lock:
+            if language not in self.prefixes:
+                self.prefixes[language] = self.engine.get_context_prefix(language=language)
+            return self.prefixes[language]
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self.write_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+            self.done += 1
+            if not record["ok"]:
+                self.failed += 1
+
+    def run_item(self, index, item, queued_at):
+        started = time.perf_counter()
+        language = item.get("language") or self.engine.language
+        prompt = str(item["prompt"]).strip()
+        record = {"index": index, "id": item.get("id", index), "prompt": prompt, "language": language}
+        first = []
+
+        def on_token(token):
+            if token and not first:
+                first.append(time.perf_counter())
+
+        try:
+            full_prompt = self.engine.get_context(prefix=self.prefix(language)) + f"\nUser: {prompt}\nAI:"
+            reply, final = self.engine.generate_reply(full_prompt, language, on_token)
+            final = final or {}
+            record.update({
+                "ok": True,
+                "reply": reply,
+                "model": final.get("model") or self.engine.backend.router.pick("chat", language),
+                "prompt_tokens": final.get("prompt_eval_count"),
+                "eval_tokens": final.get("eval_count"),
+            })
+        except Exception as e:
+            record.update({"ok": False, "error": str(e)})
+        finished = time.perf_counter()
+        record.update({
+            "queued_s": round(started - queued_at, 4),
+            "first_token_s": round(first[0] - started, 4) if first else None,
+            "total_s": round(finished - started, 4),
+        })
+        metrics.observe("batch_item_s", finished - started)
+        self.write(record)
+
+    def run(self, lines):
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for index, item, error in read_items(lines):
+                if error:
+                    self.write({"index": index, "ok": False, "error": error})
+                    continue
+                self.slots.acquire()
+                future = pool.submit(self.run_item, index, item, time.perf_counter())
+                future.add_done_callback(lambda _: self.slots.release())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through Alter")
+    parser.add_argument("input", help="JSONL prompts, - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results, - for stdout")
+    parser.add_argument("--host", action="append", help="Ollama server, repeat for several (default: settings)")
+    parser.add_argument("--concurrency", type=int, help=f"requests in flight (default: {BATCH_CONCURRENCY} per host)")
+    parser.add_argument("--settings", default=SETTINGS_FILE)
+    parser.add_argument("--memory", default=MEMORY_FILE, help="history used for the context")
+    parser.add_argument("--no-memory", action="store_true", help="persona only, no history or summary")
+    args = parser.parse_args()
+
+    settings = load_json(args.settings)
+    if args.host:
+        settings["ollama_hosts"] = args.host
+    backend = GenerationBackend(settings)
+    backend.start()
+    engine = AlterEngine(memory_file=args.memory, settings_file=args.settings, backend=backend, voice=False)
+    if args.no_memory:
+        engine.memory = []
+    concurrency = args.concurrency or BATCH_CONCURRENCY * len(backend.pool.backends)
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    runner = BatchRunner(engine, out, concurrency)
+    started = time.perf_counter()
+    try:
+        runner.run(source)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+    timing = metrics.snapshot()["timings"].get("batch_item_s", {})
+    print(
+        f"{runner.done} items ({runner.failed} failed) in {elapsed:.1f}s, {runner.done / elapsed if elapsed else 0:.2f}/s, "
+        f"item p50 {timing.get('p50', 0):.2f}s p99 {timing.get('p99', 0):.2f}s, concurrency {concurrency}",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Author: Nicolas Fecko
+
+Description: Terminal frontend for Alter, for machines without a display (SSH). Streams the reply to stdout
+as it is generated and shares memory.json, settings.json and the persona with the desktop app. Never
+imports customtkinter, so it starts in a fraction of the time.
+
+Usage:
+    python alter_cli.py
+    python alter_cli.py --memory memory.json --settings settings.json --no-voice
+
+Commands:
+    /new            start a new chat
+    /lang <name>    switch language, /lang alone lists them
+    /tts            turn the voice on or off
+    /help           show the commands
+    /quit           leave (Ctrl+D works too)
+"""
+# --- imports ---
+import argparse # For command line options
+import sys      # For writing tokens as they arrive
+from alter_engine import AlterEngine, MEMORY_FILE, SETTINGS_FILE # The headless core
+from resilience import GenerationError # For showing what went wrong
+from languages import LANGUAGES # For the language switch
+
+AI_PREFIX = "🟧 Alter: "
+USER_PROMPT = "👤 You: "
+HELP = "Commands: /new, /lang <name>, /tts, /help, /quit"
+STOP_JOIN_TIMEOUT = 2   # seconds to let the terminal catch up after Ctrl+C
+
+
+def find_language(name):
+    # "slovak" and "Slovak" are the same language
+    for language in LANGUAGES:
+        if language.lower() == name.strip().lower():
+            return language
+    return None
+
+
+def say(engine, text):
+    print(AI_PREFIX + text + "\n")
+    engine.speak(text, greeting=True)  # queued, never waits for the audio, a reply goes first
+
+
+def run_command(engine, line):
+    # Returns False once the user wants to leave
+    command, _, arg = line.partition(" ")
+    command = command.lower()
+    if command in ("/quit", "/exit"):
+        return False
+    if command == "/new":
+        print("─" * 60)
+        say(engine, engine.get_reset_message())
+    elif command == "/lang":
+        if not arg.strip():
+            print(", ".join(LANGUAGES) + "\n")
+            return True
+        language = find_language(arg)
+        if language is None:
+            print(f"Unknown language: {arg.strip()}\n")
+            return True
+        engine.set_language(language)
+        print(f"Language: {language}\n")
+    elif command == "/tts":
+        engine.set_tts_enabled(not engine.settings.get("tts_enabled", True))
+        print(f"Text-to-Speech: {'on' if engine.settings['tts_enabled'] else 'off'}\n")
+    else:
+        print(HELP + "\n")
+    return True
+
+
+def chat(engine, user_input):
+    bus = engine.start_turn(user_input)
+
+    def write(tokens):
+        sys.stdout.write("".join(tokens))
+        sys.stdout.flush()
+
+    terminal = bus.subscribe("terminal", write)
+    sys.stdout.write(AI_PREFIX)
+    sys.stdout.flush()
+    try:
+        engine.run_turn(user_input, bus)
+    except GenerationError as e:
+        terminal.thread.join()
+        print(f"\n⚠️ {e}\n")
+        return
+    except KeyboardInterrupt:
+        # Stops this reply only, nothing gets saved
+        terminal.thread.join(STOP_JOIN_TIMEOUT)
+        print("\n[stopped]\n")
+        return
+    terminal.thread.join()  # the whole reply is on screen before the next prompt
+    print("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alter in the terminal")
+    parser.add_argument("--memory", default=MEMORY_FILE)
+    parser.add_argument("--settings", default=SETTINGS_FILE)
+    parser.add_argument("--no-voice", action="store_true", help="never play audio, whatever the settings say")
+    args = parser.parse_args()
+
+    engine = AlterEngine(memory_file=args.memory, settings_file=args.settings, voice=not args.no_voice)
+
+    # --- Initial Greeting with Voice + Session Start ---
+    greeting = engine.get_greeting()
+    say(engine, greeting)
+    engine.start_session(greeting)
+    print(HELP + "\n")
+
+    try:
+        while True:
+            try:
+                user_input = input(USER_PROMPT).strip()
+            except (EOFError, KeyboardInterrupt):
+                print()
+                break
+            if not user_input:
+                continue
+            if user_input.startswith("/"):
+                if not run_command(engine, user_input):
+                    break
+                continue
+            chat(engine, user_input)
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
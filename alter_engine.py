@@ -0,0 +1,495 @@
+"""
+Author: Nicolas Fecko
+
+Description: The headless core of Alter. Memory, settings, context building, generation (backend pool, model
+routing, resilience, governor, caches) and voice scheduling live here without any UI, so the desktop app,
+a terminal or a server are all just frontends on top of one AlterEngine.
+
+Usage:
+    engine = AlterEngine()
+    engine.start_session(engine.get_greeting())
+    reply = engine.chat("Hi Alter!", on_tokens=lambda tokens: print("".join(tokens), end=""))
+"""
+# --- imports ---
+import json # For memory managment
+import os   # For File handling
+import threading    # For continuous Text
+import re   # For Sanitization
+import random   # For Random choice of greetings
+import time     # Time, not much to explain here
+from datetime import datetime   # For date, duh
+from backend_pool import BackendPool   # For AI, spread over one or more Ollama servers
+from model_router import ModelRouter, default_routes   # For picking the right model per task and language
+from token_bus import TokenBus, SentenceSegmenter, PartialReplyWriter, StreamMetrics, PARTIAL_REPLY_FILE # For streaming tokens to the UI, voice and disk
+from prefetch import ContextPrefetcher # For building the context while the user types
+from response_cache import ResponseCache, CACHE_MAX_ENTRIES, CACHE_TTL # For answering repeated questions instantly
+from metrics import metrics # For hit rates and timings
+from resilience import (resilient_stream, CircuitBreaker, client_timeout,
+                        CONNECT_TIMEOUT, FIRST_TOKEN_TIMEOUT, INTER_TOKEN_TIMEOUT) # For timeouts, retries and failing fast
+from governor import Governor, SENTENCE_BUDGET # For keeping replies short
+from context_state import ContextState, hash_prefix, CONTEXT_STATE_FILE, CONTEXT_STATE_MAX_TOKENS # For resuming the model context after a restart
+from event_channel import EventChannel # For second screens following the reply
+from languages import LANGUAGES # For the voice language
+import tts # For Voice
+from tts_cache import AudioCache, TTS_CACHE_DIR, TTS_CACHE_MAX_MB # For phrases that were said before
+
+# --- Basic Setup ---
+OLLAMA_HOSTS = ['http://localhost:11434'] # Default Ollama servers, can be overridden with "ollama_hosts" in settings
+MODEL_NAME = 'gemma3:4b' # The base Language model to be used
+SMALL_MODEL_NAME = 'gemma3:1b' # Small fast model for summaries and classification, see "model_routes" in settings
+# Mistral Language model is approximately 7 Billion Parameters / Artifficial Neurons - Does not speak Slovak.
+# jobautomation/OpenEuroLLM-Slovak:latest speaks Slovak very well.
+# Model gemma3:4b Multilingual model of 4 Billion parameters. Speaks over 140 languages while 35 on a native level.
+MEMORY_FILE = 'memory.json' # Where to store memory
+SETTINGS_FILE = "settings.json" # Where to store settings
+GREETINGS_FILE = "greetings.json" # Greetings for every launch after the first
+DEFAULT_GREETING_FILE = "default_greeting.json" # Greeting for the very first launch
+RESET_MESSAGES_FILE = "reset_messages.json" # Messages for a new chat
+SUMMARY_MAX_LENGTH = 1000  # max characters for summary
+CONTEXT_TOKEN_BUDGET = 1500 # max estimated tokens for persona + summary + history
+PERSONA_VERSION = 1 # bump when the personality prompt changes, cached answers of older versions are ignored
+
+
+def load_json(file_path, fallback=None):
+    if os.path.exists(file_path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return fallback or {}
+
+# --- Sanitization ---
+# Removes double spaces, trims, and strips weird symbols that could confuse the model
+def sanitize_text(text):
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = ''.join(c for c in text if c.isprintable())
+    return text
+
+# --- Summary update (optimized) ---
+def update_summary(memory, max_length=SUMMARY_MAX_LENGTH):
+    if len(memory) <= 6:
+        return ""
+
+    # Only include messages that have both 'user' and 'assistant'
+    older_msgs = [m for m in memory[:-6] if "user" in m and "assistant" in m]
+
+    summary_parts = []
+    for msg in older_msgs:
+        role_tag = msg.get("role", "conversation").upper()
+        user_text = msg.get("user", "")
+        assistant_text = msg.get("assistant", "")
+        summary_parts.append(f"[{role_tag}] U:{user_text} A:{assistant_text}")
+
+        if sum(len(p) for p in summary_parts) > max_length:
+            break
+
+    summary_text = " ".join(summary_parts)
+    if len(summary_text) > max_length:
+        summary_text = summary_text[:max_length] + "..."
+    return summary_text.strip()
+
+# --- Personality Prompt ---
+def persona_prompt(lang):
+    return f"""
+    You are Alter, an AI Companion created by Nicolas Fecko from Slovakia.
+    You speak warmly, wittily, and naturally, keeping messages about 1 to 2 sentances.
+    Always respond in {lang}.
+    Remember past chats, show curiosity, and avoid robotic phrasing.
+    Deescalate self-harm topics gently, comfort the user when sad.
+    Sometimes try to ask follow-ups or add personal comments to keep conversation flowing.
+    Always stay in character as Alter.
+    Don't be afraid to disagree and push user to advancing in their life.
+    """.strip()
+
+# Rough token estimate, about 4 characters per token is close enough for budgeting
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+# The time changes every minute, so it goes after the stable prefix
+def get_time_line():
+    now = datetime.now().strftime("%A, %d %B %Y, %H:%M")
+    return f"The current date and time is {now}"
+
+
+# --- Everything that talks to Ollama ---
+class GenerationBackend:
+    # One per process, engines of different users share the servers, the breaker and the cache
+    def __init__(self, settings):
+        # Every Ollama server listed in settings gets health checked, requests go to the least busy one
+        # Options found by "python autotune.py" are applied per host and model
+        self.pool = BackendPool(
+            settings.get("ollama_hosts", OLLAMA_HOSTS),
+            timeout=client_timeout(settings.get("connect_timeout", CONNECT_TIMEOUT)),
+            tuned_options=settings.get("tuned_options", {})
+        )
+        # Fails fast while Ollama is down instead of piling up stuck requests
+        self.breaker = CircuitBreaker()
+        # Which model handles which task and language, editable in settings
+        self.router = ModelRouter(settings.get("model_routes") or default_routes(MODEL_NAME, SMALL_MODEL_NAME), MODEL_NAME)
+        # Optional cache for questions that get asked over and over (kiosk mode)
+        self.response_cache = ResponseCache(
+            max_entries=settings.get("response_cache_size", CACHE_MAX_ENTRIES),
+            ttl=settings.get("response_cache_ttl", CACHE_TTL)
+        ) if settings.get("response_cache_enabled", False) else None
+        self.first_token_timeout = settings.get("first_token_timeout", FIRST_TOKEN_TIMEOUT)
+        self.inter_token_timeout = settings.get("inter_token_timeout", INTER_TOKEN_TIMEOUT)
+        self.started = False
+
+    def start(self):
+        if not self.started:
+            self.started = True
+            self.pool.start_health_checks()
+
+    def generate(self, task, language, **kwargs):
+        return self.router.generate(self.pool, task, language, **kwargs)
+
+    def stream(self, task, language, **kwargs):
+        # Timeouts, retries and the circuit breaker around one generation, see resilience.py
+        return resilient_stream(
+            lambda: self.generate(task, language, **kwargs),
+            breaker=self.breaker,
+            first_token_timeout=self.first_token_timeout,
+            inter_token_timeout=self.inter_token_timeout
+        )
+
+
+# --- The engine ---
+class AlterEngine:
+    def __init__(self, memory_file=MEMORY_FILE, settings_file=SETTINGS_FILE, context_state_file=CONTEXT_STATE_FILE,
+                 partial_reply_file=PARTIAL_REPLY_FILE, backend=None, voice=True):
+        self.memory_file = memory_file
+        self.settings_file = settings_file
+        self.partial_reply_file = partial_reply_file
+        self.voice = voice  # False: never plays audio on this machine, whatever the settings say
+
+        # --- Load memory ---
+        if os.path.exists(memory_file):
+            with open(memory_file, 'r') as f:
+                self.memory = json.load(f)
+        else:
+            self.memory = []
+        self.memory_lock = threading.Lock()
+
+        # --- Load settings properly ---
+        self.settings = load_json(settings_file, fallback={"language": "English", "tts_enabled": True})
+        # Ensure tts_enabled exists
+        self.settings.setdefault("tts_enabled", True)
+        self.settings.setdefault("ollama_hosts", OLLAMA_HOSTS)
+        self.settings.setdefault("model_routes", default_routes(MODEL_NAME, SMALL_MODEL_NAME))
+
+        if backend is None:
+            backend = GenerationBackend(self.settings)
+            backend.start()
+        self.backend = backend
+        # Warm-up, resumed contexts and replies all go to this host when it is not busier than the others
+        self.host_hint = backend.pool.affinity(memory_file)
+
+        self.context_prefetcher = ContextPrefetcher(
+            self.get_context_prefix,
+            self.context_key,
+            warm=self.warm_context if self.settings.get("prefetch_warm_cache", False) else None
+        )
+        # Model context from the last reply, saved across restarts
+        self.context_state = ContextState(
+            context_state_file,
+            max_tokens=self.settings.get("context_state_max_tokens", CONTEXT_STATE_MAX_TOKENS)
+        )
+
+        # Token, turn and TTS events for other programs, off unless "event_socket" is set
+        self.events = None
+        if self.settings.get("event_socket"):
+            try:
+                self.events = EventChannel(self.settings["event_socket"]).start()
+            except OSError as e:
+                print(f"[events] could not open {self.settings['event_socket']}: {e}")
+        self.turns = 0
+        metrics.start_autosave()    # metrics.json, cache hit rate and speed at a glance
+
+        # Sentences are rendered and played in the background, in order, see tts.py
+        self.speech = tts.SpeechPipeline(
+            on_start=lambda text: self.emit("tts_start", text=text),
+            on_end=lambda text: self.emit("tts_end", text=text),
+            cache=AudioCache(
+                self.settings.get("tts_cache_dir", TTS_CACHE_DIR),
+                self.settings.get("tts_cache_mb", TTS_CACHE_MAX_MB) * 1024 * 1024
+            ) if self.settings.get("tts_cache_enabled", True) else None,
+            engine=self.settings.get("tts_engine", "auto")   # "auto", "gtts" or "pyttsx3"
+        )
+
+    def emit(self, type, **data):
+        if self.events is not None:
+            self.events.publish(type, **data)
+
+    def close(self):
+        # When the frontend exits
+        if self.voice:
+            self.speech.close()
+        if self.events is not None:
+            self.events.close()
+
+    # --- Settings ---
+    def save_settings(self):
+        with open(self.settings_file, "w") as f:
+            json.dump(self.settings, f, indent=2)
+
+    @property
+    def language(self):
+        return self.settings.get("language", "English")
+
+    def language_code(self):
+        return LANGUAGES.get(self.language, "en")
+
+    def set_language(self, language):
+        self.settings["language"] = language
+        self.save_settings()
+        self.update_voice()
+
+    def update_voice(self):
+        # Update voice language, in the background because the offline engine is slow to start
+        if self.voice:
+            threading.Thread(target=tts.set_tts_voice, args=(self.language_code(),), name="tts-voice", daemon=True).start()
+
+    @property
+    def tts_enabled(self):
+        return self.voice and self.settings.get("tts_enabled", True)
+
+    def set_tts_enabled(self, enabled):
+        self.settings["tts_enabled"] = bool(enabled)
+        self.save_settings()
+
+    # --- Memory ---
+    def save_memory(self):
+        with self.memory_lock:
+            with open(self.memory_file, 'w') as f:
+                json.dump(self.memory, f, indent=2)
+
+    # Message counter function
+    def get_next_message_number(self):
+        if not self.memory:
+            return 1
+        else:
+            # Take the last message's number and add 1
+            last_msg = self.memory[-1]
+            return last_msg.get("message_number", 0) + 1
+
+    def add_turn(self, user_input, reply):
+        with self.memory_lock:
+            self.memory.append({
+                "message_number": self.get_next_message_number(),
+                "role": "conversation",
+                "user": sanitize_text(user_input),
+                "assistant": reply,
+                "timestamp": datetime.now().isoformat()
+            })
+        self.save_memory()
+        self.context_state.commit(hash_prefix(self.get_context_prefix()))
+
+    # Log this as a new session start
+    def start_session(self, greeting):
+        with self.memory_lock:
+            if not self.memory or "session_start" not in self.memory[-1]:
+                self.memory.append({
+                    "session_start": datetime.now().isoformat(),
+                    "greeting": greeting
+                })
+        self.emit("session_start", greeting=greeting, language=self.language)
+        # Always save memory after greeting
+        self.save_memory()
+
+    # --- Greetings ---
+    def get_greeting(self):
+        lang = self.language
+        # Use default greeting if memory is empty
+        if not os.path.exists(self.memory_file) or os.stat(self.memory_file).st_size == 0:
+            default_greetings = load_json(DEFAULT_GREETING_FILE, fallback={"English": ["Hello, I am Alter!"]})
+            return default_greetings.get(lang, default_greetings.get("English", ["Hello, I am Alter!"]))[0]
+
+        # Otherwise, pick a random greeting
+        greetings_data = load_json(GREETINGS_FILE, fallback={"English": ["Hello!"]})
+        return random.choice(greetings_data.get(lang, greetings_data.get("English", ["Hello!"])))
+
+    def get_reset_message(self):
+        reset_messages = load_json(RESET_MESSAGES_FILE, fallback={"English": ["Alright, fresh start 🚀"]})
+        return random.choice(reset_messages.get(self.language, reset_messages.get("English", ["Alright, fresh start 🚀"])))
+
+    # --- Context builder (optimized) ---
+    # The stable part of the prompt: persona, summary and recent history.
+    # It only changes when memory or language changes, so it can be prefetched and stays in the model's KV cache.
+    def get_context_prefix(self, limit=10, budget=None, language=None):
+        if budget is None:
+            budget = self.settings.get("context_token_budget", CONTEXT_TOKEN_BUDGET)
+
+        # Only include entries that have both "user" and "assistant"
+        conversation_entries = [m for m in self.memory if "user" in m and "assistant" in m]
+        recent = conversation_entries[-limit:] if conversation_entries else []
+
+        summary = update_summary(self.memory)
+
+        # Use the currently selected language
+        lang = language or self.language
+
+        context = persona_prompt(lang)
+
+        if summary:
+            context += f"\n\nEarlier conversation summary:\n{summary}"
+
+        # Token budget: drop the oldest turns until everything fits
+        turns = [f"User: {m['user']}\nAI: {m['assistant']}" for m in recent]
+        used = estimate_tokens(context)
+        while turns and used + sum(estimate_tokens(t) for t in turns) > budget:
+            turns.pop(0)
+        if turns:
+            context += "\n\n" + "\n".join(turns)
+
+        return context
+
+    # What the prefix depends on, cheap enough to check on every key press
+    def context_key(self):
+        memory = self.memory
+        last = memory[-1].get("message_number", 0) if memory else 0
+        return (len(memory), last, self.language, self.settings.get("context_token_budget", CONTEXT_TOKEN_BUDGET))
+
+    def get_context(self, limit=10, prefix=None, language=None):
+        if prefix is None:
+            prefix = self.get_context_prefix(limit, language=language)
+        return prefix + "\n\n" + get_time_line()
+
+    # Sends the stable prefix once so the server keeps it in its KV cache
+    def warm_context(self, prefix):
+        for _ in self.backend.generate("chat", self.language, prompt=prefix, options={"num_predict": 1}, prefer=self.host_hint):
+            pass
+
+    def prefetch(self):
+        if self.settings.get("prefetch_enabled", True):
+            self.context_prefetcher.request()
+
+    # --- Generation ---
+    def ask_ai_stream(self, user_input, on_token):
+        response_cache = self.backend.response_cache
+        language = self.language
+        cache_key = None
+        if response_cache is not None:
+            # Replies come from this user's memory, so they are only ever replayed to the same user
+            cache_key = response_cache.make_key(user_input, language, PERSONA_VERSION, owner=self.memory_file)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return response_cache.replay(cached, on_token)
+
+        started = time.perf_counter()
+        prefix = self.context_prefetcher.get() or self.get_context_prefix()
+
+        # Same prefix as when the last reply finished (even before a restart)? Then only the new turn is sent
+        resume = self.context_state.get(self.backend.router.pick("chat", language), hash_prefix(prefix))
+        if resume:
+            prompt = get_time_line() + f"\nUser: {user_input}\nAI:"
+            extra = {"context": resume}
+            metrics.incr("context_resumed")
+        else:
+            prompt = self.get_context(prefix=prefix) + f"\nUser: {user_input}\nAI:"
+            extra = {}
+
+        self.context_state.stage(None, None)
+        reply, final = self.generate_reply(prompt, language, on_token, **extra)
+        if final is not None:
+            self.context_state.stage(final.get("model"), final.get("context"))
+
+        if cache_key is not None:
+            response_cache.put(cache_key, reply, time.perf_counter() - started)
+        return reply
+
+    def generate_reply(self, prompt, language, on_token, **extra):
+        # Streams one reply for a finished prompt, returns (reply, final chunk or None after an early stop)
+        # Keeps replies at the persona's length, see governor.py
+        governor = Governor(self.settings.get("sentence_budget", SENTENCE_BUDGET))
+        stream = self.backend.stream(
+            "chat",
+            language,
+            prompt=prompt,
+            options={"temperature": 0.9, "top_p": 0.95, **governor.options()},
+            prefer=self.host_hint,
+            **extra
+        )
+        chunks = []  # joined once at the end instead of growing a string per token
+        final = None
+        for chunk in stream:
+            if chunk.get("done"):
+                final = chunk
+            token, enough = governor.feed(chunk.get("response", ""))
+            chunks.append(token)
+            on_token(token)
+            if enough:
+                stream.close()  # hangs up on the server so it stops decoding too
+                metrics.incr("governor_stops")
+                break
+        else:
+            rest = governor.flush()
+            if rest:
+                chunks.append(rest)
+                on_token(rest)
+        return "".join(chunks).strip(), final
+
+    # --- Voice ---
+    def speak(self, text, since=None, greeting=False, epoch=None):
+        # Returns at once, the speech pipeline renders and plays it. Greetings wait for any reply
+        if not self.tts_enabled or not text:
+            return
+        priority = tts.PRIORITY_GREETING if greeting else tts.PRIORITY_REPLY
+        self.speech.say(text, self.language_code(), since, priority, epoch)
+
+    def interrupt_speech(self):
+        # Barge-in, the user said something new so the rest of the old reply is not worth hearing
+        if self.voice:
+            self.speech.interrupt()
+
+    # --- One turn ---
+    def start_turn(self, user_input):
+        # A bus with the engine's own consumers, frontends subscribe theirs before run_turn
+        self.interrupt_speech()
+        bus = TokenBus()
+        self.turns += 1
+        bus.turn = self.turns
+
+        if self.events is not None:
+            # Never blocks, a slow listener misses tokens instead of holding up the model
+            self.emit("turn_start", turn=bus.turn, user=user_input)
+            bus.subscribe("events", lambda tokens: self.emit("token", turn=bus.turn, text="".join(tokens)))
+
+        if self.tts_enabled:
+            # Talk... like voice, every finished sentence is queued while the rest is still generating
+            spoken = []
+            epoch = self.speech.epoch   # a newer turn interrupts this one, its late sentences get dropped
+
+            def on_sentence(sentence):
+                # The first sentence carries the turn start, for time to first audio
+                self.speak(sentence, since=None if spoken else bus.started_at, epoch=epoch)
+                spoken.append(sentence)
+
+            segmenter = SentenceSegmenter(on_sentence)
+            bus.subscribe("tts", segmenter.feed, block=True, on_close=segmenter.flush)
+
+        partial = PartialReplyWriter(user_input, self.partial_reply_file)
+        bus.subscribe("partial", partial.write, batch_size=32, max_delay=1.0, on_close=partial.finish)
+
+        stream_metrics = StreamMetrics(bus)
+        bus.subscribe("metrics", stream_metrics.count, batch_size=64, max_delay=1.0, on_close=stream_metrics.finish)
+        return bus
+
+    def run_turn(self, user_input, bus):
+        # Generates into the bus and saves the turn, a failed generation raises and nothing gets saved
+        try:
+            reply = self.ask_ai_stream(user_input, bus.publish)
+        except Exception as e:
+            bus.close()
+            bus.join(names=("events",))  # every token event goes out before the end of the turn
+            self.emit("turn_error", turn=bus.turn, error=str(e))
+            raise
+        finally:
+            bus.close()     # also on Ctrl+C, so every subscriber thread ends
+        self.add_turn(user_input, reply)
+        bus.join(names=("events",))
+        self.emit("turn_end", turn=bus.turn, reply=reply)
+        return reply
+
+    def chat(self, user_input, on_tokens=None):
+        bus = self.start_turn(user_input)
+        if on_tokens is not None:
+            bus.subscribe("frontend", on_tokens)
+        return self.run_turn(user_input, bus)
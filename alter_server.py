@@ -0,0 +1,247 @@
+"""
+Author: Nicolas Fecko
+
+Description: Server mode for Alter, so many people on the LAN can talk to one machine. Plain HTTP with
+Server-Sent Events for the streamed reply, one AlterEngine (own memory, settings, language) per user,
+and a fair queue in front of Ollama so a handful of generations run at once and every user gets turns.
+
+Usage:
+    python alter_server.py --port 8765
+
+    POST /session  {"user": "alice", "language": "Slovak"}  -> {"user", "language", "greeting"}
+    POST /chat     {"user": "alice", "message": "Hi!"}      -> text/event-stream:
+                   event: queued / token {"text"} / done {"reply"} / error {"error"}
+    GET  /health   GET /metrics (queue state, p50 / p99 timings)
+
+See load_test.py for measuring throughput and latency.
+"""
+# --- imports ---
+import argparse # For command line options
+import json     # For the request / response bodies
+import os       # For the per user folders
+import re       # For checking user names
+import threading    # Every request runs in its own thread
+import time     # For latency timing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # For serving
+from alter_engine import AlterEngine, GenerationBackend, SETTINGS_FILE, load_json # The headless core
+from fair_queue import FairQueue, QueueFull, MAX_ACTIVE, MAX_WAITING_PER_USER, QUEUE_TIMEOUT # For sharing Ollama fairly
+from tenants import TenantRegistry, MAX_RESIDENT, IDLE_TIMEOUT # For per user engines and locks
+from languages import LANGUAGES # For checking languages
+from metrics import metrics # For throughput and latency
+
+USERS_DIR = "users"     # users/<name>/memory.json, settings.json, ...
+LISTEN_BACKLOG = 512    # connections the OS holds while every handler thread is busy
+USER_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")   # user names end up as folder names
+
+
+class AlterService:
+    def __init__(self, settings, users_dir=USERS_DIR):
+        self.settings = settings
+        self.users_dir = users_dir
+        self.backend = GenerationBackend(settings)  # shared by every user
+        self.backend.start()
+        self.queue = FairQueue(
+            settings.get("server_max_active", MAX_ACTIVE),
+            settings.get("server_max_waiting_per_user", MAX_WAITING_PER_USER)
+        )
+        self.queue_timeout = settings.get("server_queue_timeout", QUEUE_TIMEOUT)
+        # Per user engines and locks, idle users are dropped from memory, see tenants.py
+        self.tenants = TenantRegistry(
+            self.load_engine,
+            max_resident=settings.get("server_max_resident_users", MAX_RESIDENT),
+            idle_timeout=settings.get("server_idle_timeout", IDLE_TIMEOUT)
+        )
+        self.tenants.start_sweeper()
+
+    def load_engine(self, user):
+        folder = os.path.join(self.users_dir, user)
+        os.makedirs(folder, exist_ok=True)
+        return AlterEngine(
+            memory_file=os.path.join(folder, "memory.json"),
+            settings_file=os.path.join(folder, "settings.json"),
+            context_state_file=os.path.join(folder, "context_state.json"),
+            partial_reply_file=os.path.join(folder, "partial_reply.json"),
+            backend=self.backend,
+            voice=False     # the server never plays audio itself
+        )
+
+
+class AlterHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG  # the default of 5 resets clients when hundreds connect at once
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # keep the console quiet
+
+        def send_json(self, payload, status=200):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_json(self):
+            length = int(self.headers.get("Content-Length", 0) or 0)
+            if not length:
+                return {}
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return None
+            return body if isinstance(body, dict) else None
+
+        def read_user(self):
+            # (request body, user name), or None after an error response was sent
+            request = self.read_json()
+            if request is None:
+                self.send_json({"error": "body must be a JSON object"}, status=400)
+                return None
+            user = str(request.get("user", ""))
+            if not USER_NAME.match(user):
+                self.send_json({"error": "user must be 1-64 letters, digits, '-' or '_'"}, status=400)
+                return None
+            return request, user
+
+        def do_GET(self):
+            if self.path == "/health":
+                self.send_json({"status": "ok", "resident_users": len(service.tenants)})
+            elif self.path == "/metrics":
+                snapshot = metrics.snapshot()
+                snapshot["queue"] = {"active": service.queue.active, "waiting": service.queue.waiting()}
+                self.send_json(snapshot)
+            else:
+                self.send_json({"error": "not found"}, status=404)
+
+        def do_POST(self):
+            if self.path == "/session":
+                self.start_session()
+            elif self.path == "/chat":
+                try:
+                    self.chat()
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # the client left, the turn still gets saved
+            else:
+                self.send_json({"error": "not found"}, status=404)
+
+        # --- Sessions ---
+        def start_session(self):
+            parsed = self.read_user()
+            if parsed is None:
+                return
+            request, user = parsed
+            language = request.get("language")
+            if language is not None and language not in LANGUAGES:
+                self.send_json({"error": f"unknown language: {language}"}, status=400)
+                return
+
+            with service.tenants.use(user) as tenant, tenant.lock:
+                engine = tenant.engine
+                if language is not None and language != engine.language:
+                    engine.set_language(language)
+                greeting = engine.get_greeting()
+                engine.start_session(greeting)
+            self.send_json({"user": user, "language": engine.language, "greeting": greeting})
+
+        # --- Chat over Server-Sent Events ---
+        def send_event(self, event, data):
+            payload = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+            with self.write_lock:
+                self.wfile.write(payload)
+                self.wfile.flush()
+
+        def chat(self):
+            started = time.perf_counter()
+            parsed = self.read_user()
+            if parsed is None:
+                return
+            request, user = parsed
+            message = str(request.get("message", "")).strip()
+            if not message:
+                self.send_json({"error": "message is empty"}, status=400)
+                return
+
+            try:
+                ticket = service.queue.enqueue(user)
+            except QueueFull as e:
+                self.send_json({"error": str(e)}, status=429)
+                return
+
+            self.write_lock = threading.Lock()
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                self.close_connection = True
+                self.send_event("queued", {"waiting": service.queue.waiting()})
+                service.queue.wait(ticket, service.queue_timeout)
+                with service.tenants.use(user) as tenant, tenant.lock:
+                    self.run_turn(tenant.engine, message, started)
+            except TimeoutError as e:
+                self.send_event("error", {"error": str(e)})
+            finally:
+                service.queue.release(ticket)
+
+        def run_turn(self, engine, message, started):
+            bus = engine.start_turn(message)
+            client_gone = threading.Event()
+
+            first = []
+
+            def stream(tokens):
+                if client_gone.is_set():
+                    return
+                if not first:
+                    first.append(True)
+                    metrics.observe("server_first_token_s", time.perf_counter() - started)
+                try:
+                    self.send_event("token", {"text": "".join(tokens)})
+                except OSError:
+                    client_gone.set()  # generation goes on, the reply is saved for next time
+
+            sse = bus.subscribe("sse", stream)
+            try:
+                reply = engine.run_turn(message, bus)
+            except Exception as e:
+                sse.thread.join()
+                metrics.incr("server_errors")
+                if not client_gone.is_set():
+                    self.send_event("error", {"error": str(e)})
+                return
+            sse.thread.join()  # every token is out before "done"
+            metrics.incr("server_turns")
+            metrics.observe("server_turn_s", time.perf_counter() - started)
+            if not client_gone.is_set():
+                self.send_event("done", {"reply": reply})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alter over HTTP with Server-Sent Events")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--settings", default=SETTINGS_FILE, help="server wide settings (Ollama hosts, limits)")
+    parser.add_argument("--users-dir", default=USERS_DIR)
+    parser.add_argument("--max-active", type=int, help="generations running at once")
+    args = parser.parse_args()
+
+    settings = load_json(args.settings)
+    if args.max_active:
+        settings["server_max_active"] = args.max_active
+    service = AlterService(settings, args.users_dir)
+
+    server = AlterHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Alter listening on http://{args.host}:{args.port} ({service.queue.max_active} generations at once)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
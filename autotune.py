@@ -0,0 +1,156 @@
+"""
+Author: Nicolas Fecko
+
+Description: Hardware autotuner for Alter. Runs a short benchmark grid of Ollama options (threads, batch size,
+GPU layers) against a server, measures prefill and decode tokens per second, and stores the fastest options
+per host and model in settings.json. The backend pool applies them to every request. The context size is not
+tuned, a smaller one is always faster but cuts Alter's prompts short, so it is set to what the app needs.
+
+Usage:
+    python autotune.py                       # every host from settings, default model
+    python autotune.py --host http://localhost:11434 --model gemma3:4b --quick
+"""
+# --- imports ---
+import argparse # For command line options
+import itertools    # For the option grid
+import json     # For settings
+import os       # For CPU count and settings file
+from datetime import datetime   # For the tuned_at stamp
+from ollama import Client   # For AI
+from alter_engine import MODEL_NAME, OLLAMA_HOSTS, SETTINGS_FILE, CONTEXT_TOKEN_BUDGET # Same model and settings file as the app
+from context_state import CONTEXT_STATE_MAX_TOKENS # Longest context the app resumes
+
+DEFAULT_HOST = OLLAMA_HOSTS[0]
+DEFAULT_MODEL = MODEL_NAME
+BENCH_PREDICT = 48              # tokens decoded per benchmark run
+TYPICAL_PROMPT_TOKENS = 800     # a usual Alter prompt: persona + summary + history
+TYPICAL_REPLY_TOKENS = 60       # "about 1 to 2 sentances"
+TURN_HEADROOM_TOKENS = 512      # new message, time line and reply on top of the history or resumed context
+
+# A few paragraphs so prefill has something to chew on
+BENCH_PROMPT = " ".join([
+    "You are Alter, an AI Companion. You speak warmly, wittily, and naturally.",
+    "Remember past chats, show curiosity, and avoid robotic phrasing.",
+] * 20) + "\nUser: Tell me something interesting about the ocean.\nAI:"
+
+
+def required_num_ctx(settings=None):
+    # Smallest power of two that holds the longest prompt the app sends plus a reply
+    settings = settings or {}
+    need = max(
+        settings.get("context_token_budget", CONTEXT_TOKEN_BUDGET),
+        settings.get("context_state_max_tokens", CONTEXT_STATE_MAX_TOKENS)
+    ) + TURN_HEADROOM_TOKENS
+    num_ctx = 2048
+    while num_ctx < need:
+        num_ctx *= 2
+    return num_ctx
+
+
+def option_grid(quick=False, num_ctx=None):
+    num_ctx = num_ctx or required_num_ctx()
+    cores = os.cpu_count() or 4
+    threads = sorted({max(1, cores // 2), cores}) if quick else sorted({max(1, cores // 4), max(1, cores // 2), cores})
+    batches = [256, 512] if quick else [128, 256, 512]
+    gpus = [None, 0]    # None: let Ollama decide, 0: CPU only
+    grid = []
+    for num_thread, num_batch, num_gpu in itertools.product(threads, batches, gpus):
+        options = {"num_thread": num_thread, "num_batch": num_batch, "num_ctx": num_ctx}
+        if num_gpu is not None:
+            options["num_gpu"] = num_gpu
+        grid.append(options)
+    return grid
+
+
+def run_benchmark(client, model, options, repeat=2):
+    # Best of `repeat` runs, the first run after an option change also reloads the model
+    best = None
+    for _ in range(repeat):
+        # A different first line every run, so Ollama's prompt cache can't skip the prefill
+        response = client.generate(
+            model=model,
+            prompt=f"Session {os.urandom(4).hex()}\n" + BENCH_PROMPT,
+            options={**options, "num_predict": BENCH_PREDICT, "temperature": 0},
+            keep_alive="5m"
+        )
+        prefill_tps = rate(response.get("prompt_eval_count"), response.get("prompt_eval_duration"))
+        decode_tps = rate(response.get("eval_count"), response.get("eval_duration"))
+        if not prefill_tps or not decode_tps:
+            continue
+        result = {"prefill_tps": prefill_tps, "decode_tps": decode_tps, "turn_s": turn_seconds(prefill_tps, decode_tps)}
+        if best is None or result["turn_s"] < best["turn_s"]:
+            best = result
+    return best
+
+
+def rate(count, duration_ns):
+    if not count or not duration_ns:
+        return 0.0
+    return count / (duration_ns / 1e9)
+
+
+# Estimated time of a typical turn, this is what we minimize
+def turn_seconds(prefill_tps, decode_tps):
+    return TYPICAL_PROMPT_TOKENS / prefill_tps + TYPICAL_REPLY_TOKENS / decode_tps
+
+
+def autotune(host, model, quick=False, repeat=2, num_ctx=None, log=print):
+    client = Client(host=host)
+    results = []
+    for options in option_grid(quick, num_ctx):
+        try:
+            result = run_benchmark(client, model, options, repeat)
+        except Exception as e:
+            log(f"  {options} failed: {e}")
+            continue
+        if result is None:
+            log(f"  {options} returned no timings")
+            continue
+        log(f"  {options}: prefill {result['prefill_tps']:.1f} tok/s, decode {result['decode_tps']:.1f} tok/s, turn {result['turn_s']:.2f}s")
+        results.append((result, options))
+    if not results:
+        return None
+    result, options = min(results, key=lambda r: r[0]["turn_s"])
+    return {
+        "options": options,
+        "prefill_tps": round(result["prefill_tps"], 1),
+        "decode_tps": round(result["decode_tps"], 1),
+        "tuned_at": datetime.now().isoformat()
+    }
+
+
+def load_settings(path=SETTINGS_FILE):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def save_tuned(host, model, tuned, path=SETTINGS_FILE):
+    settings = load_settings(path)
+    settings.setdefault("tuned_options", {}).setdefault(host, {})[model] = tuned
+    with open(path, "w") as f:
+        json.dump(settings, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the fastest Ollama options for this machine")
+    parser.add_argument("--host", action="append", help="Ollama host, can be given more than once (default: hosts from settings)")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--quick", action="store_true", help="smaller grid")
+    parser.add_argument("--repeat", type=int, default=2, help="runs per option set, the best one counts")
+    parser.add_argument("--dry-run", action="store_true", help="don't write settings.json")
+    args = parser.parse_args()
+
+    settings = load_settings()
+    hosts = args.host or settings.get("ollama_hosts") or [DEFAULT_HOST]
+    num_ctx = required_num_ctx(settings)
+    for host in hosts:
+        print(f"Tuning {args.model} on {host} (num_ctx {num_ctx}) ...")
+        tuned = autotune(host, args.model, quick=args.quick, repeat=args.repeat, num_ctx=num_ctx)
+        if tuned is None:
+            print(f"No usable results for {host}")
+            continue
+        print(f"Fastest on {host}: {tuned['options']} (prefill {tuned['prefill_tps']} tok/s, decode {tuned['decode_tps']} tok/s)")
+        if not args.dry_run:
+            save_tuned(host, args.model, tuned)
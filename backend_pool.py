@@ -0,0 +1,224 @@
+"""
+Author: Nicolas Fecko
+
+Description: Backend pool for Alter. Keeps track of several Ollama servers, checks which ones are alive
+and which models they have loaded, and sends every request to the least busy server that fits.
+"""
+# --- imports ---
+import threading    # For the health check loop and the in-flight counters
+import time         # For check intervals
+import zlib         # Stable hash for host affinity
+from ollama import Client   # For AI
+from model_router import is_missing_model   # A missing model is not a dead server
+
+HEALTH_CHECK_INTERVAL = 10  # seconds between health / loaded model checks
+RETRY_DOWN_AFTER = 30       # seconds before a dead host is tried again without a health check
+COLD_MODEL_PENALTY = 1      # a host without the model loaded counts as this many extra requests in flight
+MISSING_MODEL_TTL = 300     # seconds a host's 404 for a model is remembered, a later "ollama pull" is noticed after that
+
+
+# --- One Ollama server ---
+class Backend:
+    def __init__(self, host, timeout=None):
+        self.host = host
+        self.client = Client(host=host, timeout=timeout)
+        self.healthy = True         # optimistic until the first check says otherwise
+        self.loaded_models = set()  # models currently resident in memory on this host
+        self.in_flight = 0          # requests we are currently running on this host
+        self.last_error = None
+        self.down_since = None
+        self.missing_models = {}    # model -> (when, the 404), models this host does not have
+
+    def has_model(self, model):
+        return model in self.loaded_models
+
+    def lacks_model(self, model, now):
+        missing = self.missing_models.get(model)
+        return missing is not None and now - missing[0] < MISSING_MODEL_TTL
+
+    def __repr__(self):
+        state = "up" if self.healthy else "down"
+        return f"<Backend {self.host} {state} in_flight={self.in_flight} models={sorted(self.loaded_models)}>"
+
+
+# --- The pool ---
+class BackendPool:
+    def __init__(self, hosts, check_interval=HEALTH_CHECK_INTERVAL, timeout=None, tuned_options=None):
+        if not hosts:
+            raise ValueError("BackendPool needs at least one Ollama host")
+        self.backends = [Backend(host, timeout) for host in hosts]
+        self.tuned_options = tuned_options or {}  # host -> model -> autotune result, see autotune.py
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self._rr = 0  # round robin offset so equal hosts share the work
+        self._checker = None
+        self._stop = threading.Event()
+
+    # --- Health checks ---
+    def check_backend(self, backend):
+        try:
+            running = backend.client.ps()
+            models = {m.get("model") or m.get("name") for m in running.get("models", [])}
+        except Exception as e:
+            self.mark_down(backend, e)
+            return False
+        with self.lock:
+            backend.loaded_models = {m for m in models if m}
+            backend.healthy = True
+            backend.last_error = None
+            backend.down_since = None
+        return True
+
+    def check_all(self):
+        for backend in self.backends:
+            self.check_backend(backend)
+
+    def start_health_checks(self):
+        if self._checker and self._checker.is_alive():
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                self.check_all()
+                self._stop.wait(self.check_interval)
+
+        self._checker = threading.Thread(target=loop, daemon=True)
+        self._checker.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def mark_down(self, backend, error):
+        with self.lock:
+            backend.healthy = False
+            backend.last_error = error
+            if backend.down_since is None:
+                backend.down_since = time.monotonic()
+
+    def mark_missing(self, backend, model, error):
+        with self.lock:
+            backend.missing_models[model] = (time.monotonic(), error)
+
+    def missing_model_error(self, model):
+        # The remembered 404 when no host has the model, so the router falls back without asking again
+        now = time.monotonic()
+        with self.lock:
+            if all(b.lacks_model(model, now) for b in self.backends):
+                return self.backends[0].missing_models[model][1]
+        return None
+
+    # --- Routing ---
+    def affinity(self, key):
+        # The host a session should stick to, so its warm-up and its replies meet the same KV cache
+        return self.backends[zlib.crc32(key.encode("utf-8")) % len(self.backends)].host
+
+    def acquire(self, model, exclude=(), prefer=None):
+        # Pick the least loaded healthy host. Not having the model loaded costs a little, so a warm host wins
+        # a tie but a busy one still spills over to the others. The preferred host wins the remaining ties
+        with self.lock:
+            now = time.monotonic()
+            candidates = [
+                b for b in self.backends
+                if b not in exclude and not b.lacks_model(model, now)
+                and (b.healthy or now - b.down_since > RETRY_DOWN_AFTER)
+            ]
+            if not candidates:
+                return None
+            start = self._rr % len(self.backends)
+            self._rr += 1
+            order = {b: (i - start) % len(self.backends) for i, b in enumerate(self.backends)}
+            best = min(candidates, key=lambda b: (
+                not b.healthy,
+                b.in_flight + (0 if b.has_model(model) else COLD_MODEL_PENALTY),
+                not b.has_model(model),
+                b.host != prefer,
+                order[b]
+            ))
+            best.in_flight += 1
+            return best
+
+    def release(self, backend):
+        with self.lock:
+            backend.in_flight = max(0, backend.in_flight - 1)
+
+    # Hardware options found by autotune.py, the request's own options win
+    def apply_tuned(self, backend, model, kwargs):
+        tuned = self.tuned_options.get(backend.host, {}).get(model)
+        if not tuned:
+            return kwargs
+        return {**kwargs, "options": {**tuned.get("options", {}), **(kwargs.get("options") or {})}}
+
+    # --- Same shape as client.generate ---
+    def generate(self, model, prompt, stream=False, prefer=None, **kwargs):
+        if stream:
+            return self._generate_stream(model, prompt, prefer, **kwargs)
+
+        tried = []
+        last_error = None
+        while True:
+            backend = self.acquire(model, tried, prefer)
+            if backend is None:
+                raise last_error or self.missing_model_error(model) or self.no_backend_error()
+            tried.append(backend)
+            try:
+                response = backend.client.generate(model=model, prompt=prompt, **self.apply_tuned(backend, model, kwargs))
+            except Exception as e:
+                if is_missing_model(e):
+                    self.mark_missing(backend, model, e)
+                else:
+                    self.mark_down(backend, e)
+                last_error = e
+                continue
+            finally:
+                self.release(backend)
+            backend.loaded_models.add(model)
+            return response
+
+    def _generate_stream(self, model, prompt, prefer=None, **kwargs):
+        tried = []
+        last_error = None
+        while True:
+            backend = self.acquire(model, tried, prefer)
+            if backend is None:
+                raise last_error or self.missing_model_error(model) or self.no_backend_error()
+            tried.append(backend)
+
+            # The request only goes out on the first read, so failover is only possible up to the first chunk
+            try:
+                stream = backend.client.generate(model=model, prompt=prompt, stream=True, **self.apply_tuned(backend, model, kwargs))
+                first = next(stream, None)
+            except Exception as e:
+                self.release(backend)
+                if is_missing_model(e):
+                    self.mark_missing(backend, model, e)
+                else:
+                    self.mark_down(backend, e)
+                last_error = e
+                continue
+
+            backend.loaded_models.add(model)
+            try:
+                if first is not None:
+                    yield first
+                for chunk in stream:
+                    yield chunk
+            finally:
+                self.release(backend)
+            return
+
+    def no_backend_error(self):
+        errors = [f"{b.host}: {b.last_error}" for b in self.backends if b.last_error]
+        return ConnectionError("No Ollama backend available" + (" (" + "; ".join(errors) + ")" if errors else ""))
+
+    def status(self):
+        with self.lock:
+            return [
+                {
+                    "host": b.host,
+                    "healthy": b.healthy,
+                    "in_flight": b.in_flight,
+                    "loaded_models": sorted(b.loaded_models),
+                    "last_error": str(b.last_error) if b.last_error else None,
+                }
+                for b in self.backends
+            ]
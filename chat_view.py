@@ -0,0 +1,158 @@
+"""
+Author: Nicolas Fecko
+
+Description: Chat view helpers. Worker threads never touch Tk directly, they push text (or small UI calls)
+into a queue, and the Tk main loop drains it once per frame, turning everything that arrived within the
+frame into a single insert. The UI scheduler does the draining.
+"""
+# --- imports ---
+from collections import deque   # append / popleft are thread safe
+import customtkinter as ctk # For UI
+from metrics import metrics     # Shared metrics registry
+
+FRAME_MS = 16   # about 60 frames per second
+
+
+class TokenRenderer:
+    def __init__(self, chatbox, frame_ms=FRAME_MS):
+        self.chatbox = chatbox
+        self.frame_ms = frame_ms
+        self.items = deque()    # (text, tag) or (callable, args)
+
+    # --- Safe from any thread ---
+    def push(self, text, tag="ai"):
+        if text:
+            self.items.append((text, tag))
+
+    def call(self, fn, *args):
+        # Runs fn on the Tk main loop, in order with the text pushed before it
+        self.items.append((fn, args))
+
+    # --- Tk main loop only ---
+    def start(self, scheduler):
+        scheduler.every("render", self.frame_ms, self.drain)
+
+    def drain(self):
+        batch = []
+        while self.items:
+            batch.append(self.items.popleft())
+        if batch:
+            self._render(batch)
+
+    def _render(self, batch):
+        pieces = []   # text runs of this frame, [tag, [texts]]
+        for item, extra in batch:
+            if callable(item):
+                self._flush(pieces)
+                pieces = []
+                item(*extra)
+            elif pieces and pieces[-1][0] == extra:
+                pieces[-1][1].append(item)
+            else:
+                pieces.append([extra, [item]])
+        self._flush(pieces)
+
+    def _flush(self, pieces):
+        if not pieces:
+            return
+        self.chatbox.configure(state="normal")
+        for tag, texts in pieces:
+            self.chatbox.insert(ctk.END, "".join(texts), tag)
+        self.chatbox.configure(state="disabled")
+        self.chatbox.see(ctk.END)
+        metrics.incr("render_frames")
+
+
+# --- Windowed chat view ---
+MAX_MESSAGES = 100  # messages kept in the Tk widget
+PAGE_SIZE = 20      # memory entries loaded per page when scrolling up
+LOADED_FACTOR = 4   # while paging back the window may grow to this many times max_messages
+SCROLL_CHECK_MS = 200   # how often we look whether the user reached the top
+DIVIDER = "\n" + "─" * 60 + "\n"
+
+
+class ChatWindow:
+    # Keeps only the newest messages in the chatbox, older ones come back from memory when scrolling up
+    def __init__(self, chatbox, load_older, max_messages=MAX_MESSAGES, page_size=PAGE_SIZE):
+        self.chatbox = chatbox
+        self.load_older = load_older    # (start, end) -> [(sender, message, tag, cursor)] from memory[start:end]
+        self.max_messages = max_messages
+        self.max_loaded = LOADED_FACTOR * max_messages  # hard cap while the user is paging back
+        self.page_size = page_size
+        self.messages = deque()     # (mark, cursor), oldest first. memory[:cursor] is older than the message
+        self.floor = 0              # never page back past this memory index (start of this chat)
+        self.counter = 0
+
+    def _new_mark(self):
+        self.counter += 1
+        return f"msg{self.counter}"
+
+    def reset(self, floor):
+        self.chatbox.configure(state="normal")
+        self.chatbox.delete("1.0", ctk.END)
+        self.chatbox.configure(state="disabled")
+        for mark, _ in self.messages:
+            self.chatbox.mark_unset(mark)
+        self.messages.clear()
+        self.floor = floor
+
+    def add(self, sender, message, tag, cursor):
+        self.chatbox.configure(state="normal")
+        if self.chatbox.index("end-1c") != "1.0":
+            self.chatbox.insert(ctk.END, DIVIDER, "divider")
+        start = self.chatbox.index("end-1c")
+        self.chatbox.insert(ctk.END, f"{sender}: ", tag)
+        self.chatbox.insert(ctk.END, message + "\n", tag)
+        mark = self._new_mark()
+        self.chatbox.mark_set(mark, start)
+        self.messages.append((mark, cursor))
+        self._trim(self.max_messages)
+        self.chatbox.configure(state="disabled")
+        self.chatbox.see(ctk.END)
+
+    def _trim(self, limit):
+        # Drops the oldest messages a whole turn at a time (same cursor), page_in() only brings back whole turns.
+        # The next message's mark is right after its divider
+        while len(self.messages) > limit:
+            _, cursor = self.messages[0]
+            count = 1
+            while count < len(self.messages) - 1 and self.messages[count][1] == cursor:
+                count += 1
+            for _ in range(count):
+                mark, _ = self.messages.popleft()
+                self.chatbox.mark_unset(mark)
+            self.chatbox.delete("1.0", self.messages[0][0])
+            metrics.incr("chat_messages_trimmed", count)
+
+    def page_in(self):
+        # Loads one page of older messages from memory on top of the chat
+        if not self.messages or len(self.messages) >= self.max_loaded:
+            return False
+        first_mark, end = self.messages[0]
+        start = max(self.floor, end - self.page_size)
+        if start >= end:
+            return False
+        older = self.load_older(start, end)
+        if not older:
+            self.messages[0] = (first_mark, start)  # nothing to show in there, skip it next time
+            return False
+
+        self.chatbox.configure(state="normal")
+        for sender, message, tag, cursor in reversed(older):
+            self.chatbox.insert("1.0", DIVIDER, "divider")
+            self.chatbox.insert("1.0", message + "\n", tag)
+            self.chatbox.insert("1.0", f"{sender}: ", tag)
+            mark = self._new_mark()
+            self.chatbox.mark_set(mark, "1.0")
+            self.messages.appendleft((mark, cursor))
+        self.chatbox.configure(state="disabled")
+        self.chatbox.see(first_mark)    # keep the user where they were
+        metrics.incr("chat_pages_loaded")
+        return True
+
+    def check_scroll(self):
+        if self.chatbox.yview()[0] <= 0.0:
+            self.page_in()
+
+    def watch(self, scheduler, interval_ms=SCROLL_CHECK_MS):
+        scheduler.every("chat_scroll", interval_ms, self.check_scroll)
@@ -0,0 +1,74 @@
+"""
+Author: Nicolas Fecko
+
+Description: Keeps the model context that Ollama returns after every reply, together with a hash of the
+prompt prefix it stands for, and saves it to disk. As long as the prefix did not change (same memory,
+language, persona), the next turn - even after restarting the app - only sends the new user message
+instead of the whole persona, summary and history again.
+"""
+# --- imports ---
+import hashlib  # For the prefix hash
+import json     # For saving the state
+import os       # For file handling
+import threading    # Written from the generation thread
+from datetime import datetime   # For timestamps
+
+CONTEXT_STATE_FILE = "context_state.json"   # Where the context survives restarts
+CONTEXT_STATE_MAX_TOKENS = 3000 # Longer chains start over from the full prompt, where the summary takes over
+
+
+def hash_prefix(prefix):
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+
+class ContextState:
+    def __init__(self, path=CONTEXT_STATE_FILE, max_tokens=CONTEXT_STATE_MAX_TOKENS):
+        self.path = path
+        self.max_tokens = max_tokens
+        self.lock = threading.Lock()
+        self.entries = {}   # model -> {"prefix_hash", "context", "saved_at"}
+        self.staged = None
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}  # a broken file just means a cold start
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump(self.entries, f)
+
+    def get(self, model, prefix_hash):
+        # The saved context, but only if it still matches the current prompt prefix
+        with self.lock:
+            entry = self.entries.get(model)
+            if entry and entry["prefix_hash"] == prefix_hash:
+                return entry["context"]
+        return None
+
+    def stage(self, model, context):
+        # Called with the final chunk of a reply, committed once memory is saved
+        with self.lock:
+            self.staged = (model, list(context)) if model and context else None
+
+    def commit(self, prefix_hash):
+        # prefix_hash: the prefix as it looks now that the reply is in memory
+        with self.lock:
+            staged, self.staged = self.staged, None
+            if staged is None:
+                return
+            model, context = staged
+            if len(context) > self.max_tokens:
+                self.entries.pop(model, None)
+            else:
+                self.entries[model] = {
+                    "prefix_hash": prefix_hash,
+                    "context": context,
+                    "saved_at": datetime.now().isoformat()
+                }
+            self.save()
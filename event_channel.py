@@ -0,0 +1,149 @@
+"""
+Author: Nicolas Fecko
+
+Description: Local event channel for second screens (avatar renderer, subtitle overlay, ...). Alter
+broadcasts token, turn and TTS events as JSON lines over a Unix socket (or localhost TCP where Unix sockets
+are missing). Every event has a sequence number. Each listener has its own bounded queue and thread, so a
+slow listener only misses events (visible as a gap in "seq") and never slows generation down.
+
+Usage:
+    settings.json: "event_socket": "alter_events.sock"     (or "tcp://127.0.0.1:8766")
+    python event_channel.py alter_events.sock               # prints the events as they arrive
+"""
+# --- imports ---
+import json     # Events are JSON lines
+import os       # For removing a stale socket file
+import socket   # For the listeners
+import sys      # For the listener command
+import threading    # One writer thread per listener
+import time     # For event timestamps
+from collections import deque   # Per listener queue
+from metrics import metrics     # Shared metrics registry
+
+EVENT_SOCKET = "alter_events.sock"
+MAX_PENDING = 1024  # events queued per listener before it starts missing some
+
+
+def parse_address(address):
+    # (family, address) for "tcp://host:port" or a Unix socket path
+    if address.startswith("tcp://"):
+        host, _, port = address[6:].rpartition(":")
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address
+
+
+# --- One listener ---
+class EventListener:
+    def __init__(self, conn, max_pending=MAX_PENDING):
+        self.conn = conn
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="event-listener", daemon=True)
+
+    def push(self, data):
+        # Never waits, a full queue just drops the event
+        with self.cond:
+            if self.closed:
+                return
+            if len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                metrics.incr("event_drops")
+                return
+            self.pending.append(data)
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def _run(self):
+        try:
+            while True:
+                with self.cond:
+                    self.cond.wait_for(lambda: self.pending or self.closed)
+                    if self.closed:
+                        return
+                    batch = b"".join(self.pending)
+                    self.pending.clear()
+                self.conn.sendall(batch)
+        except OSError:
+            pass    # the listener went away
+        finally:
+            self.close()
+            self.conn.close()
+
+
+# --- The channel ---
+class EventChannel:
+    def __init__(self, address=EVENT_SOCKET, max_pending=MAX_PENDING):
+        self.address = address
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.seq = 0
+        self.server = None
+
+    def start(self):
+        family, address = parse_address(self.address)
+        server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                os.remove(address)  # left over from a crash
+        else:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(address)
+        server.listen()
+        self.server = server
+        threading.Thread(target=self._accept, name="event-channel", daemon=True).start()
+        return self
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return  # closed
+            listener = EventListener(conn, self.max_pending)
+            listener.thread.start()
+            with self.lock:
+                self.listeners = [l for l in self.listeners if not l.closed] + [listener]
+
+    def publish(self, type, **data):
+        # Encoded once, under the lock so the sequence numbers go out in order
+        with self.lock:
+            self.seq += 1
+            line = json.dumps({"seq": self.seq, "type": type, "time": time.time(), **data}, ensure_ascii=False)
+            line = (line + "\n").encode("utf-8")
+            for listener in self.listeners:
+                listener.push(line)
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        with self.lock:
+            for listener in self.listeners:
+                listener.close()
+            self.listeners = []
+        family, address = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(address):
+            os.remove(address)
+
+
+def listen(address=EVENT_SOCKET):
+    # Prints every event, handy for building an overlay or checking what Alter sends
+    family, address = parse_address(address)
+    with socket.socket(family, socket.SOCK_STREAM) as conn:
+        conn.connect(address)
+        for line in conn.makefile("r", encoding="utf-8"):
+            print(line, end="", flush=True)
+
+
+if __name__ == "__main__":
+    try:
+        listen(sys.argv[1] if len(sys.argv) > 1 else EVENT_SOCKET)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,107 @@
+"""
+Author: Nicolas Fecko
+
+Description: Fair queue in front of the Ollama servers. Only a fixed number of generations run at once, and
+when more are waiting the free slots go round robin over the users, so one user sending ten messages
+cannot push everyone else to the back of the line. A user gets one slot at a time: their replies run one after
+another anyway (same memory), so a second request waits in line instead of holding a slot it cannot use.
+"""
+# --- imports ---
+import threading    # Handler threads wait here
+import time     # For queue wait timing
+from collections import deque   # Per user waiting lines
+from metrics import metrics     # Shared metrics registry
+
+MAX_ACTIVE = 4          # generations running at once
+MAX_WAITING_PER_USER = 3    # requests one user may have waiting
+QUEUE_TIMEOUT = 120     # seconds a request may wait for a slot
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Ticket:
+    def __init__(self, user):
+        self.user = user
+        self.granted = False
+        self.queued_at = time.perf_counter()
+
+
+class FairQueue:
+    def __init__(self, max_active=MAX_ACTIVE, max_waiting_per_user=MAX_WAITING_PER_USER):
+        self.max_active = max_active
+        self.max_waiting_per_user = max_waiting_per_user
+        self.cond = threading.Condition()
+        self.queues = {}        # user -> deque of waiting tickets
+        self.rotation = deque() # users with waiting tickets, next one to get a slot first
+        self.active = 0
+        self.running = set()    # users holding a slot
+
+    def enqueue(self, user):
+        # Takes a place in line or raises QueueFull right away, then wait() for the slot
+        ticket = Ticket(user)
+        with self.cond:
+            line = self.queues.setdefault(user, deque())
+            if len(line) >= self.max_waiting_per_user:
+                metrics.incr("queue_rejected")
+                raise QueueFull(f"{user} already has {len(line)} requests waiting")
+            line.append(ticket)
+            if user not in self.rotation:
+                self.rotation.append(user)
+            self._dispatch()
+        return ticket
+
+    def wait(self, ticket, timeout=QUEUE_TIMEOUT):
+        with self.cond:
+            if not self.cond.wait_for(lambda: ticket.granted, timeout):
+                self._drop(ticket)
+                metrics.incr("queue_timeouts")
+                raise TimeoutError("Waited too long for a free generation slot")
+        metrics.observe("queue_wait_s", time.perf_counter() - ticket.queued_at)
+
+    def release(self, ticket):
+        with self.cond:
+            if ticket.granted:
+                ticket.granted = False
+                self.active -= 1
+                self.running.discard(ticket.user)
+                if ticket.user in self.rotation:
+                    # Just had a turn, everyone else waiting goes first
+                    self.rotation.remove(ticket.user)
+                    self.rotation.append(ticket.user)
+            else:
+                self._drop(ticket)
+            self._dispatch()
+
+    def waiting(self):
+        with self.cond:
+            return sum(len(line) for line in self.queues.values())
+
+    def _drop(self, ticket):
+        line = self.queues.get(ticket.user)
+        if line and ticket in line:
+            line.remove(ticket)
+            if not line:
+                del self.queues[ticket.user]
+                self.rotation.remove(ticket.user)
+
+    def _dispatch(self):
+        # Hands free slots to the head of each user's line in turn, skipping users who already hold one
+        busy = []
+        while self.active < self.max_active and self.rotation:
+            user = self.rotation.popleft()
+            if user in self.running:
+                busy.append(user)
+                continue
+            line = self.queues[user]
+            ticket = line.popleft()
+            ticket.granted = True
+            self.active += 1
+            self.running.add(user)
+            if line:
+                self.rotation.append(user)
+            else:
+                del self.queues[user]
+        self.rotation.extend(busy)  # they were just served, the others go first
+        self.cond.notify_all()
@@ -0,0 +1,61 @@
+"""
+Author: Nicolas Fecko
+
+Description: Generation governor for Alter. The persona asks for short replies, this makes sure of it:
+stop sequences for made up "User:" lines, a num_predict cap derived from the sentence budget, and an
+early stop once enough complete sentences have streamed.
+"""
+# --- imports ---
+from token_bus import SENTENCE_END     # Same sentence rule as the TTS stage
+
+SENTENCE_BUDGET = 3     # "1 to 2 sentances" plus room for a follow-up question
+TOKENS_PER_SENTENCE = 40    # generous, a sentence is usually 15-25 tokens
+STOP_SEQUENCES = ["User:", "\nAI:"]     # the model sometimes starts writing the user's lines too
+
+
+class Governor:
+    def __init__(self, sentence_budget=SENTENCE_BUDGET, stop=STOP_SEQUENCES):
+        self.sentence_budget = sentence_budget
+        self.stop = stop
+        self.sentences = 0
+        self.tail = ""      # text since the last sentence end, so we never rescan the whole reply
+        self.pending = ""   # held back text that might be the start of a stop marker
+        self.done = False
+
+    def options(self):
+        # Merged into the Ollama options, the server stops on its own where it can
+        return {"stop": list(self.stop), "num_predict": self.sentence_budget * TOKENS_PER_SENTENCE}
+
+    def feed(self, token):
+        # Returns (text to pass on, whether generation should stop now)
+        if self.done:
+            return "", True
+        text = self.tail + token
+        out = self.pending + token
+
+        # A stop marker slipped through, cut right before it
+        cut = min((i for i in (out.find(s) for s in self.stop) if i >= 0), default=-1)
+        if cut >= 0:
+            self.done = True
+            self.pending = ""
+            return out[:cut].rstrip(), True
+
+        last = 0
+        for match in SENTENCE_END.finditer(text):
+            self.sentences += 1
+            last = match.end()
+            if self.sentences >= self.sentence_budget:
+                self.done = True
+                self.pending = ""
+                return out[:max(0, len(out) - (len(text) - match.end()))].rstrip(), True
+        self.tail = text[last:]
+
+        # Hold back the end of the text if a stop marker could be starting there, like "\nUs"
+        hold = max((n for s in self.stop for n in range(1, len(s)) if out.endswith(s[:n])), default=0)
+        self.pending = out[len(out) - hold:] if hold else ""
+        return out[:len(out) - hold], False
+
+    def flush(self):
+        # Whatever was held back, once the stream ended on its own
+        rest, self.pending = self.pending, ""
+        return rest
@@ -0,0 +1,164 @@
+"""
+Author: Nicolas Fecko
+
+Description: Lazy access to the history in memory.json. A background scan remembers where every entry
+sits in the file and groups entries into sessions (one per "session_start"). Turns are then read
+page by page straight from those byte ranges, and search walks the file in pages too, so nothing
+ever needs the whole history loaded at once.
+"""
+# --- imports ---
+import json     # For decoding single entries
+import os       # For file stats
+import re       # For finding braces and strings quickly while scanning
+import threading    # Scans and searches run in the background
+
+MEMORY_FILE = "memory.json"
+SCAN_CHUNK = 1 << 16    # bytes read per step while scanning
+SEARCH_PAGE = 50        # entries read per step while searching
+SPECIAL = re.compile(rb'[{}"\\]')   # the only bytes that matter for finding object boundaries
+
+
+class Session:
+    def __init__(self, number, started=None, greeting=""):
+        self.number = number
+        self.started = started      # ISO timestamp from the session_start entry
+        self.greeting = greeting
+        self.spans = []             # (start, end) byte ranges of the turns in memory.json
+
+    def title(self):
+        when = (self.started or "Earlier")[:16].replace("T", " ")
+        return f"{when} ({len(self.spans)} turns)"
+
+
+class HistoryIndex:
+    def __init__(self, path=MEMORY_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.sessions = []
+        self.stamp = None   # (mtime, size) of the file the index was built from
+        self.building = None
+
+    # --- Index ---
+    def file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def is_stale(self):
+        return self.stamp != self.file_stamp()
+
+    def build_async(self, on_done=None):
+        # Scans in a background thread, on_done(sessions) is called from that thread
+        with self.lock:
+            if self.building and self.building.is_alive():
+                return
+            self.building = threading.Thread(target=self._build, args=(on_done,), daemon=True)
+            self.building.start()
+
+    def _build(self, on_done):
+        stamp = self.file_stamp()
+        sessions = []
+        current = None
+        for start, end, entry in self.scan():
+            if "session_start" in entry:
+                current = Session(len(sessions), entry.get("session_start"), entry.get("greeting", ""))
+                sessions.append(current)
+            elif "user" in entry and "assistant" in entry:
+                if current is None:
+                    current = Session(0)
+                    sessions.append(current)
+                current.spans.append((start, end))
+        with self.lock:
+            self.sessions = sessions
+            self.stamp = stamp
+        if on_done:
+            on_done(sessions)
+
+    def scan(self):
+        # Yields (start, end, entry) for every top level object, reading the file in chunks
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            depth = 0
+            in_string = False
+            skip = 0        # a backslash escapes the next byte, specials before this offset are ignored
+            start = None    # file offset of the object being read
+            parts = []      # its bytes from earlier chunks
+            pos = 0
+            while True:
+                chunk = f.read(SCAN_CHUNK)
+                if not chunk:
+                    break
+                cut = 0
+                for match in SPECIAL.finditer(chunk):
+                    at = pos + match.start()
+                    if at < skip:
+                        continue
+                    char = match.group()
+                    if in_string:
+                        if char == b"\\":
+                            skip = at + 2
+                        elif char == b'"':
+                            in_string = False
+                        continue
+                    if char == b'"':
+                        in_string = True
+                    elif char == b"{":
+                        if depth == 0:
+                            start, parts, cut = at, [], match.start()
+                        depth += 1
+                    elif char == b"}":
+                        depth -= 1
+                        if depth == 0 and start is not None:
+                            raw = b"".join(parts) + chunk[cut:match.start() + 1]
+                            try:
+                                yield start, at + 1, json.loads(raw)
+                            except ValueError:
+                                pass
+                            start, parts = None, []
+                if start is not None:
+                    parts.append(chunk[cut:])  # object continues in the next chunk
+                pos += len(chunk)
+
+    # --- Reading ---
+    def read_spans(self, spans):
+        # One read from the first to the last byte, then slice the entries out
+        if not spans:
+            return []
+        first, last = spans[0][0], spans[-1][1]
+        with open(self.path, "rb") as f:
+            f.seek(first)
+            data = f.read(last - first)
+        entries = []
+        for start, end in spans:
+            try:
+                entries.append(json.loads(data[start - first:end - first]))
+            except ValueError:
+                pass
+        return entries
+
+    def load_turns(self, session, start=0, count=20):
+        return self.read_spans(session.spans[start:start + count])
+
+    # --- Search ---
+    def search_async(self, query, on_match, on_done=None):
+        # Returns an Event, set it to cancel. on_match(session, entry) is called from the search thread
+        cancel = threading.Event()
+        needle = query.casefold().strip()
+
+        def run():
+            if needle:
+                for session in list(self.sessions):
+                    for i in range(0, len(session.spans), SEARCH_PAGE):
+                        if cancel.is_set():
+                            return
+                        for entry in self.read_spans(session.spans[i:i + SEARCH_PAGE]):
+                            if needle in entry.get("user", "").casefold() or needle in entry.get("assistant", "").casefold():
+                                on_match(session, entry)
+            if on_done and not cancel.is_set():
+                on_done()
+
+        threading.Thread(target=run, daemon=True).start()
+        return cancel
@@ -0,0 +1,172 @@
+"""
+Author: Nicolas Fecko
+
+Description: History sidebar. Lists past sessions, shows a session's turns a page at a time and searches
+while you type. All reading happens in background threads (see history_store.py), results come back
+to the Tk main loop through the UI scheduler.
+"""
+# --- imports ---
+import threading    # For loading pages in the background
+import customtkinter as ctk # For UI
+
+SESSIONS_PAGE = 50      # session buttons created at a time
+TURNS_PAGE = 20         # turns loaded per "Load more"
+SEARCH_DELAY_MS = 300   # typing pause before a search starts
+MAX_RESULTS = 100       # search result buttons shown at most
+
+
+class HistoryPanel(ctk.CTkFrame):
+    def __init__(self, master, index, scheduler, width=280):
+        super().__init__(master, width=width, corner_radius=10)
+        self.index = index
+        self.scheduler = scheduler
+        self.selected = None    # session shown in the viewer
+        self.loaded = 0         # how many of its turns are shown
+        self.shown_sessions = 0
+        self.search_cancel = None
+        self.search_token = 0   # results of older searches are ignored
+        self.results = 0
+
+        ctk.CTkLabel(self, text="History", font=ctk.CTkFont(size=16, weight="bold")).pack(pady=(10, 5))
+
+        self.search_entry = ctk.CTkEntry(self, placeholder_text="Search...")
+        self.search_entry.pack(fill="x", padx=10, pady=(0, 5))
+        self.search_entry.bind("<KeyRelease>", self.on_search_typed)
+
+        self.status = ctk.CTkLabel(self, text="", font=("Courier New", 11), text_color="gray")
+        self.status.pack(anchor="w", padx=10)
+
+        self.list_frame = ctk.CTkScrollableFrame(self, height=180)
+        self.list_frame.pack(fill="x", padx=10, pady=5)
+
+        self.viewer = ctk.CTkTextbox(self, wrap="word", font=("Courier New", 12))
+        self.viewer.pack(fill="both", expand=True, padx=10, pady=5)
+        self.viewer.tag_config("user", foreground="#00ffff")
+        self.viewer.tag_config("ai", foreground="#ffaa44")
+        self.viewer.configure(state="disabled")
+
+        self.more_btn = ctk.CTkButton(self, text="Load more", height=24, command=self.load_more, state="disabled")
+        self.more_btn.pack(pady=(0, 10))
+
+    # --- Sessions ---
+    def refresh(self):
+        # Called when the panel opens, rescans only if memory.json changed
+        if self.index.is_stale():
+            self.status.configure(text="Loading history...")
+            self.index.build_async(lambda sessions: self.scheduler.post(self.show_sessions))
+        elif not self.search_entry.get().strip():
+            self.show_sessions()
+
+    def clear_list(self):
+        for child in self.list_frame.winfo_children():
+            child.destroy()
+
+    def show_sessions(self):
+        if self.search_entry.get().strip():
+            self.start_search()
+            return
+        self.clear_list()
+        self.shown_sessions = 0
+        self.status.configure(text=f"{len(self.index.sessions)} sessions")
+        self.show_more_sessions()
+
+    def show_more_sessions(self):
+        # Newest first, buttons are only created a page at a time
+        sessions = list(reversed(self.index.sessions))
+        page = sessions[self.shown_sessions:self.shown_sessions + SESSIONS_PAGE]
+        for child in self.list_frame.winfo_children():
+            if getattr(child, "is_more_button", False):
+                child.destroy()
+        for session in page:
+            ctk.CTkButton(
+                self.list_frame, text=session.title(), anchor="w", height=24, fg_color="transparent",
+                command=lambda s=session: self.open_session(s)
+            ).pack(fill="x", pady=1)
+        self.shown_sessions += len(page)
+        if self.shown_sessions < len(sessions):
+            more = ctk.CTkButton(self.list_frame, text="More sessions...", height=24, fg_color="gray", command=self.show_more_sessions)
+            more.is_more_button = True
+            more.pack(fill="x", pady=1)
+
+    # --- Turns ---
+    def open_session(self, session):
+        self.selected = session
+        self.loaded = 0
+        self.viewer.configure(state="normal")
+        self.viewer.delete("1.0", ctk.END)
+        if session.greeting:
+            self.viewer.insert(ctk.END, f"🟧 Alter: {session.greeting}\n\n", "ai")
+        self.viewer.configure(state="disabled")
+        self.load_more()
+
+    def load_more(self):
+        session, start = self.selected, self.loaded
+        if session is None:
+            return
+        self.more_btn.configure(state="disabled")
+
+        def work():
+            entries = self.index.load_turns(session, start, TURNS_PAGE)
+            self.scheduler.post(self.append_turns, session, entries)
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def append_turns(self, session, entries):
+        if session is not self.selected:
+            return
+        self.viewer.configure(state="normal")
+        for entry in entries:
+            if entry.get("user"):
+                self.viewer.insert(ctk.END, f"👤 You: {entry['user']}\n", "user")
+            self.viewer.insert(ctk.END, f"🟧 Alter: {entry.get('assistant', '')}\n\n", "ai")
+        self.viewer.configure(state="disabled")
+        self.loaded += len(entries)
+        self.more_btn.configure(state="normal" if self.loaded < len(session.spans) else "disabled")
+
+    # --- Search ---
+    def on_search_typed(self, event=None):
+        self.scheduler.after(SEARCH_DELAY_MS, self.start_search, name="history_search")
+
+    def start_search(self):
+        if self.search_cancel is not None:
+            self.search_cancel.set()
+            self.search_cancel = None
+        self.search_token += 1
+        token = self.search_token
+        query = self.search_entry.get().strip()
+        if not query:
+            self.show_sessions()
+            return
+        if self.index.stamp is None:
+            # Never scanned yet, search once the index is there
+            self.refresh()
+            return
+
+        self.clear_list()
+        self.results = 0
+        self.status.configure(text="Searching...")
+        self.search_cancel = self.index.search_async(
+            query,
+            lambda session, entry: self.scheduler.post(self.add_result, token, session, entry),
+            lambda: self.scheduler.post(self.search_done, token)
+        )
+
+    def add_result(self, token, session, entry):
+        if token != self.search_token or self.results >= MAX_RESULTS:
+            return
+        self.results += 1
+        text = (entry.get("user") or entry.get("assistant", ""))[:40]
+        ctk.CTkButton(
+            self.list_frame, text=f"{session.title()[:16]}  {text}", anchor="w", height=24, fg_color="transparent",
+            command=lambda s=session: self.open_session(s)
+        ).pack(fill="x", pady=1)
+        self.status.configure(text=f"Searching... {self.results} found")
+        if self.results >= MAX_RESULTS and self.search_cancel is not None:
+            self.search_cancel.set()
+            self.search_done(token)
+
+    def search_done(self, token):
+        if token == self.search_token:
+            more = "+" if self.results >= MAX_RESULTS else ""
+            self.status.configure(text=f"{self.results}{more} found")
+            self.search_cancel = None
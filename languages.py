@@ -0,0 +1,182 @@
+"""
+Author: Nicolas Fecko
+
+Description: Languages Alter speaks. LANGUAGES maps the names shown in the settings to the ISO codes gTTS
+and pyttsx3 want, LANG_MAP goes the other way for detecting the system language.
+"""
+# --- imports ---
+import locale   # For detecting system language
+
+# Available languages
+# 54 Languages
+# Fixed the ISO codes for gTTS
+LANGUAGES = {
+    # ---- Europe ----
+    #West Europe
+    "English": "en",
+    "French": "fr",
+    "Dutch": "nl",
+    "Irish": "ga",
+    "Welsh": "cy",
+    # Central Europe
+    "German": "de",
+    "Polish": "pl",
+    "Czech": "cs",
+    "Slovak": "sk",
+    "Hungarian": "hu",
+    # South Europe
+    "Italian": "it",
+    "Spanish": "es",
+    "Portugese": "pt",
+    "Maltese": "mt",     # Malta
+    # North Europe
+    "Danish": "da",
+    "Finnish": "fi",
+    "Swedish": "sv",
+    "Norwegian": "no",
+    "Icelandic": "is",
+    # Balkan
+    "Romanian": "ro",
+    "Greek": "el",
+    "Croatian": "hr",
+    "Bosnian": "bs",
+    "Serbian": "sr",
+    "Macedonian": "mk",
+    "Albanian": "sq",
+    "Bulgarian": "bg",
+    "Slovenian": "sl",
+    # Eastern Europe
+    "Russian": "ru",
+    "Ukrainian": "uk",
+    "Belarusian": "be",
+    "Azerbaijani": "az",
+    "Armenian": "hy",
+    "Georgian": "ka",
+    # Baltic
+    "Estonian": "et",
+    "Latvian": "lv",
+    "Lithuanian": "lt",
+    # Kebab
+    "Turkish": "tr",
+    # ----    -----
+
+    # ---- Asia ----
+    # East Asia
+    "Chinese": "zh-CN",
+    "Japanese": "ja",
+    "Korean": "ko",
+    "Mongolian": "mn",
+    # South Asia
+    "Hindi": "hi",
+
+    # Southeast Asia
+    "Vietnamese": "vi",
+    "Thai": "th",
+    "Indonesian": "id",
+
+    # Middle East
+    "Arabic": "ar",
+    "Persian (Farsi)": "fa",
+    "Hebrew": "he",
+    
+    # Stans
+    "Kazakh": "kk",
+    "Kyrgyz": "ky",
+
+    # ---- ----
+    # Africa
+    "Afrikaans": "af",
+    "Swahili": "sw",
+    "Somali": "so",
+
+    # ---- ----
+    # ---- Territories / Minority & Sensitive Languages ----
+    # ---- Europe ----
+    "Catalan": "ca",     # Catalonia (Spain, politically sensitive)
+    "Galician": "gl",     # Galicia, Spain
+    "Basque": "eu",      # Basque Country, Spain/France
+    "Breton": "br",      # Brittany, France
+    "Abkhaz": "ab",      # Abkhazia (disputed territory with Georgia)
+    # ---- ----
+    # ---- Asia ----
+    "Tamil": "ta",       # Sri Lanka / India (historical conflict)
+    "Maori": "mi",       # New Zealand, indigenous language
+    "Khmer": "km",       # Cambodia
+    "Telugu": "te",      # India
+    "Urdu": "ur",        # Pakistan / India
+    "Nepali": "ne",      # Nepal / India
+    "Ainu": "ain",       # Japan, indigenous
+    "Adygean": "ady",    # North Caucasus, Russia
+    
+}
+
+LANG_MAP = {
+    # ---- Europe ----
+    "en": "English",
+    "fr": "French",
+    "nl": "Dutch",
+    "ga": "Irish",
+    "cy": "Welsh",
+    "de": "German",
+    "pl": "Polish",
+    "cs": "Czech",
+    "sk": "Slovak",
+    "hu": "Hungarian",
+    "it": "Italian",
+    "es": "Spanish",
+    "pt": "Portuguese",
+    "da": "Danish",
+    "fi": "Finnish",
+    "sv": "Swedish",
+    "no": "Norwegian",
+    "is": "Icelandic",
+    "ro": "Romanian",
+    "el": "Greek",
+    "hr": "Croatian",
+    "bs": "Bosnian",
+    "sr": "Serbian",
+    "mk": "Macedonian",
+    "sq": "Albanian",
+    "bg": "Bulgarian",
+    "sl": "Slovenian",
+    "ru": "Russian",
+    "uk": "Ukrainian",
+    "be": "Belarusian",
+    "az": "Azerbaijani",
+    "hy": "Armenian",
+    "ka": "Georgian",
+    "et": "Estonian",
+    "lv": "Latvian",
+    "lt": "Lithuanian",
+    "tr": "Turkish",
+
+    # ---- Asia ----
+    "zh-CN": "Chinese",
+    "ja": "Japanese",
+    "ko": "Korean",
+    "mn": "Mongolian",
+    "hi": "Hindi",
+    "vi": "Vietnamese",
+    "th": "Thai",
+    "id": "Indonesian",
+    "ar": "Arabic",
+    "fa": "Persian (Farsi)",
+    "he": "Hebrew",
+    "kk": "Kazakh",
+    "ky": "Kyrgyz",
+
+    # ---- Africa ----
+    "af": "Afrikaans",
+    "sw": "Swahili",
+    "so": "Somali",
+}
+
+
+# --- Detect System language ---
+def system_language():
+    try:
+        system_lang = locale.getdefaultlocale()[0]  # e.g. 'en_US'
+    except Exception:
+        system_lang = None
+    lang_code = system_lang.split('_')[0] if system_lang else "en"
+    return LANG_MAP.get(lang_code, "English")
@@ -0,0 +1,108 @@
+"""
+Author: Nicolas Fecko
+
+Description: Load test for the Alter server. Starts a number of simulated users that open a session and
+send messages over SSE at the same time, then prints throughput and p50 / p99 latencies (time to first
+token, full reply). Point it at a server running on top of stand_in_server.py to test without a GPU.
+
+Usage:
+    python load_test.py --url http://localhost:8765 --users 200 --messages 3
+"""
+# --- imports ---
+import argparse # For command line options
+import http.client  # For streaming the SSE responses
+import json     # For the request / response bodies
+import threading    # One thread per simulated user
+import time     # For latency timing
+from urllib.parse import urlparse   # For splitting the server url
+from metrics import percentile  # Same percentiles as the server reports
+
+
+def post(url, path, body):
+    # Returns the open response, the caller reads (and closes) it
+    parts = urlparse(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=300)
+    connection.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+    return connection.getresponse()
+
+
+def chat_once(url, user, message):
+    # (seconds to first token, seconds to done, tokens received, error or None)
+    started = time.perf_counter()
+    first = None
+    tokens = 0
+    event = None
+    response = post(url, "/chat", {"user": user, "message": message})
+    try:
+        if response.status != 200:
+            return None, None, 0, f"HTTP {response.status}: {response.read().decode('utf-8', 'replace')}"
+        for raw in response:
+            line = raw.decode("utf-8").rstrip("\n")
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                if event == "token":
+                    tokens += 1
+                    if first is None:
+                        first = time.perf_counter() - started
+                elif event == "done":
+                    return first, time.perf_counter() - started, tokens, None
+                elif event == "error":
+                    return first, None, tokens, json.loads(line[6:]).get("error")
+        return first, None, tokens, "stream ended without done"
+    finally:
+        response.close()
+
+
+def run_user(url, user, messages, results, lock):
+    try:
+        post(url, "/session", {"user": user}).read()
+        for i in range(messages):
+            result = chat_once(url, user, f"Message {i + 1} from {user}, how are you?")
+            with lock:
+                results.append(result)
+    except OSError as e:
+        with lock:
+            results.append((None, None, 0, str(e)))
+
+
+def report(results, elapsed):
+    ok = [r for r in results if r[3] is None]
+    errors = [r[3] for r in results if r[3] is not None]
+    first = sorted(r[0] for r in ok if r[0] is not None)
+    total = sorted(r[1] for r in ok)
+    print(f"Replies: {len(ok)} ok, {len(errors)} failed in {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"Throughput: {len(ok) / elapsed:.2f} replies/s, {sum(r[2] for r in ok) / elapsed:.1f} token events/s")
+    if first:
+        print(f"First token: p50 {percentile(first, 50):.3f}s  p99 {percentile(first, 99):.3f}s  max {first[-1]:.3f}s")
+    if total:
+        print(f"Full reply:  p50 {percentile(total, 50):.3f}s  p99 {percentile(total, 99):.3f}s  max {total[-1]:.3f}s")
+    for error in sorted(set(errors))[:5]:
+        print(f"  error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the Alter server")
+    parser.add_argument("--url", default="http://localhost:8765")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=3, help="messages per user, sent one after another")
+    parser.add_argument("--prefix", default="load", help="user names are <prefix>-<n>")
+    args = parser.parse_args()
+
+    results = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=run_user, args=(args.url, f"{args.prefix}-{n}", args.messages, results, lock))
+        for n in range(args.users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report(results, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Author: Nicolas Fecko
+
+Description: Small in-process metrics registry for Alter. Counters and timings are kept in memory
+and can be dumped to metrics.json for a quick look at how fast (or slow) things are. The file is written in
+the background every few seconds when something changed, and once more on exit.
+"""
+# --- imports ---
+import atexit   # Last save on exit
+import json     # For saving the snapshot
+import os       # For replacing the file in one step
+import threading    # Metrics are updated from worker threads
+import time     # For the save interval
+from collections import deque   # For the recent values window
+
+METRICS_FILE = "metrics.json"   # Where snapshots get saved
+WINDOW_SIZE = 500   # How many recent values are kept per timing for percentiles
+SAVE_INTERVAL = 10  # seconds between background saves
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.timings = {}
+        self.changes = 0    # bumped on every update, so unchanged metrics are not written again
+        self.save_lock = threading.Lock()
+        self.saver = None
+
+    def incr(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            self.changes += 1
+
+    def observe(self, name, value):
+        with self.lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = {"count": 0, "total": 0.0, "min": value, "max": value, "recent": deque(maxlen=WINDOW_SIZE)}
+            timing["count"] += 1
+            timing["total"] += value
+            timing["min"] = min(timing["min"], value)
+            timing["max"] = max(timing["max"], value)
+            timing["recent"].append(value)
+            self.changes += 1
+
+    def get(self, name, default=0):
+        with self.lock:
+            return self.counters.get(name, default)
+
+    def snapshot(self):
+        with self.lock:
+            timings = {}
+            for name, t in self.timings.items():
+                recent = sorted(t["recent"])
+                timings[name] = {
+                    "count": t["count"],
+                    "avg": t["total"] / t["count"],
+                    "min": t["min"],
+                    "max": t["max"],
+                    "p50": percentile(recent, 50),
+                    "p99": percentile(recent, 99),
+                }
+            return {"counters": dict(self.counters), "timings": timings}
+
+    def save(self, path=METRICS_FILE):
+        # Written to a temporary name and swapped in, so a reader never sees half a file
+        with self.save_lock:
+            snapshot = self.snapshot()
+            partial = path + ".part"
+            with open(partial, "w") as f:
+                json.dump(snapshot, f, indent=2)
+            os.replace(partial, path)
+        return snapshot
+
+    def start_autosave(self, path=METRICS_FILE, interval=SAVE_INTERVAL):
+        # Once per process, later calls do nothing. The path is fixed now, the working directory may change
+        path = os.path.abspath(path)
+        with self.save_lock:
+            if self.saver is not None:
+                return
+            self.saver = threading.Thread(target=self._autosave, args=(path, interval), name="metrics-save", daemon=True)
+            self.saver.start()
+        atexit.register(self.save, path)
+
+    def _autosave(self, path, interval):
+        saved = 0
+        while True:
+            time.sleep(interval)
+            changes = self.changes
+            if changes != saved:
+                try:
+                    self.save(path)
+                    saved = changes
+                except OSError as e:
+                    print(f"[metrics] could not save {path}: {e}")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# Shared registry, everything in the app reports here
+metrics = Metrics()
@@ -0,0 +1,65 @@
+"""
+Author: Nicolas Fecko
+
+Description: Model router for Alter. Picks which model handles a task (chat, summary, classify) in which
+language, so cheap jobs go to a small fast model and languages like Slovak go to a model that speaks them well.
+
+Routing rules live in settings under "model_routes", for example:
+    {
+        "tasks": {"chat": "gemma3:4b", "summary": "gemma3:1b", "classify": "gemma3:1b"},
+        "languages": {"Slovak": {"chat": "jobautomation/OpenEuroLLM-Slovak:latest"}}
+    }
+A language entry can also be a plain model name, then it is used for every task in that language.
+"""
+
+
+def default_routes(main_model, small_model):
+    return {
+        "tasks": {"chat": main_model, "summary": small_model, "classify": small_model},
+        "languages": {"Slovak": {"chat": "jobautomation/OpenEuroLLM-Slovak:latest"}}
+    }
+
+
+# Ollama answers 404 when the model is not pulled on that server
+def is_missing_model(error):
+    return getattr(error, "status_code", None) == 404
+
+
+class ModelRouter:
+    def __init__(self, routes, default_model):
+        self.routes = routes or {}
+        self.default_model = default_model
+        self.reported = set()   # missing models already printed once
+
+    def candidates(self, task="chat", language=None):
+        # Most specific model first, the default model is always the last resort
+        models = []
+        by_language = self.routes.get("languages", {}).get(language)
+        if isinstance(by_language, str):
+            models.append(by_language)
+        elif isinstance(by_language, dict) and by_language.get(task):
+            models.append(by_language[task])
+        if self.routes.get("tasks", {}).get(task):
+            models.append(self.routes["tasks"][task])
+        models.append(self.default_model)
+        return list(dict.fromkeys(models))  # drop duplicates, keep order
+
+    def pick(self, task="chat", language=None):
+        return self.candidates(task, language)[0]
+
+    def generate(self, pool, task="chat", language=None, **kwargs):
+        # Streams from the best model, falls back to the next one if a model is not pulled anywhere
+        models = self.candidates(task, language)
+        for i, model in enumerate(models):
+            started = False
+            try:
+                for chunk in pool.generate(model=model, stream=True, **kwargs):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or not is_missing_model(e) or i == len(models) - 1:
+                    raise
+                if model not in self.reported:
+                    self.reported.add(model)
+                    print(f"[router] model {model} is not available, falling back to {models[i + 1]}")
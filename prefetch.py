@@ -0,0 +1,58 @@
+"""
+Author: Nicolas Fecko
+
+Description: Speculative prefetch for Alter. While the user is still typing, the context (recent history,
+summary, token budget) is built in the background, and optionally sent to the model once so the
+server already has the stable prompt prefix in its KV cache when Send is pressed.
+"""
+# --- imports ---
+import threading    # Prefetch runs in the background
+from metrics import metrics     # Shared metrics registry
+
+
+class ContextPrefetcher:
+    def __init__(self, build, key, warm=None):
+        self.build = build  # builds the stable prompt prefix
+        self.key = key      # cheap fingerprint of everything the prefix depends on
+        self.warm = warm    # optional, sends the prefix to the model to fill its KV cache
+        self.lock = threading.Lock()
+        self.cached_key = None
+        self.cached = None
+        self.warmed_key = None
+        self.worker = None
+
+    def request(self):
+        # Safe to call on every key press, only one prefetch runs at a time
+        with self.lock:
+            if self.worker and self.worker.is_alive():
+                return
+            self.worker = threading.Thread(target=self._work, daemon=True)
+            self.worker.start()
+
+    def _work(self):
+        key = self.key()
+        with self.lock:
+            prefix = self.cached if self.cached_key == key else None
+        if prefix is None:
+            prefix = self.build()
+            with self.lock:
+                self.cached_key, self.cached = key, prefix
+            metrics.incr("prefetch_builds")
+
+        if self.warm and self.warmed_key != key:
+            try:
+                self.warm(prefix)
+                self.warmed_key = key
+                metrics.incr("prefetch_warms")
+            except Exception as e:
+                print(f"[prefetch] warming the KV cache failed: {e}")
+
+    def get(self):
+        # The prefetched prefix if it still matches the current state, otherwise None
+        key = self.key()
+        with self.lock:
+            if self.cached_key == key:
+                metrics.incr("prefetch_hits")
+                return self.cached
+        metrics.incr("prefetch_misses")
+        return None
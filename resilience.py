@@ -0,0 +1,195 @@
+"""
+Author: Nicolas Fecko
+
+Description: Resilience layer around generation. Timeouts for connecting, for the first token and between
+tokens, a few retries with jittered backoff, and a circuit breaker that fails fast while Ollama is down,
+so the UI gets an error instead of sitting on "Thinking" forever.
+"""
+# --- imports ---
+import queue    # For handing chunks over from the reader thread
+import random   # For backoff jitter
+import threading    # The stream is read in its own thread so we can time it out
+import time     # For backoff and the breaker's cool down
+import httpx    # Ollama's HTTP library, for timeouts and transport errors
+from metrics import metrics     # Shared metrics registry
+
+CONNECT_TIMEOUT = 5         # seconds to open a connection to Ollama
+READ_TIMEOUT = 300          # hard limit for a single socket read, so stuck reader threads always end
+FIRST_TOKEN_TIMEOUT = 90    # seconds to wait for the first token (covers model loading and prefill)
+INTER_TOKEN_TIMEOUT = 20    # seconds allowed between two tokens
+RETRIES = 2                 # extra attempts, only before the first token arrived
+BACKOFF_BASE = 0.5          # seconds, doubled every attempt
+BACKOFF_MAX = 8             # seconds
+BREAKER_THRESHOLD = 3       # failures in a row that open the breaker
+BREAKER_RESET = 30          # seconds the breaker stays open before trying again
+
+
+# --- Errors the UI can show ---
+class GenerationError(Exception):
+    pass
+
+class GenerationTimeout(GenerationError):
+    pass
+
+class CircuitOpenError(GenerationError):
+    pass
+
+
+def client_timeout(connect=CONNECT_TIMEOUT, read=READ_TIMEOUT):
+    return httpx.Timeout(read, connect=connect)
+
+
+def is_retryable(error):
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (GenerationTimeout, ConnectionError, httpx.TransportError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status >= 500 or status == 429)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    # "Full jitter": anywhere between 0 and the exponential step, so retries don't arrive in lockstep
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+# --- Circuit breaker ---
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_after=BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.state = "closed"   # closed: normal, open: fail fast, half_open: one trial request
+        self.opened_at = 0.0
+        self.trial_at = 0.0
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= self.reset_after:
+                self.state = "half_open"
+                self.trial_at = now
+                return True
+            if self.state == "half_open" and now - self.trial_at >= self.reset_after:
+                # The trial never reported back, let another one through
+                self.trial_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.state = "closed"
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    metrics.incr("breaker_opened")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def abandon(self):
+        # The request ended without an outcome (Ctrl+C), a trial in flight counts as failed
+        with self.lock:
+            if self.state == "half_open":
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def retry_in(self):
+        with self.lock:
+            return max(0.0, self.reset_after - (time.monotonic() - self.opened_at))
+
+
+# --- Token timeouts ---
+_DONE = object()
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def with_token_timeouts(stream, first_token_timeout=FIRST_TOKEN_TIMEOUT, inter_token_timeout=INTER_TOKEN_TIMEOUT):
+    # Reads the stream in a helper thread and raises GenerationTimeout when it goes quiet for too long
+    chunks = queue.Queue()
+    stop = threading.Event()
+
+    def pump():
+        try:
+            for chunk in stream:
+                if stop.is_set():
+                    break
+                chunks.put(chunk)
+            chunks.put(_DONE)
+        except Exception as e:
+            chunks.put(_Failure(e))
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()  # closing the HTTP stream also makes Ollama stop decoding
+
+    threading.Thread(target=pump, daemon=True).start()
+
+    timeout = first_token_timeout
+    try:
+        while True:
+            try:
+                item = chunks.get(timeout=timeout)
+            except queue.Empty:
+                if timeout == first_token_timeout:
+                    raise GenerationTimeout(f"No reply from the model after {first_token_timeout}s") from None
+                raise GenerationTimeout(f"The model stopped responding for {inter_token_timeout}s") from None
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+            timeout = inter_token_timeout
+    finally:
+        stop.set()
+
+
+# --- Everything together ---
+def resilient_stream(make_stream, breaker=None, retries=RETRIES,
+                     first_token_timeout=FIRST_TOKEN_TIMEOUT, inter_token_timeout=INTER_TOKEN_TIMEOUT):
+    attempt = 0
+    while True:
+        if breaker is not None and not breaker.allow():
+            metrics.incr("breaker_rejected")
+            raise CircuitOpenError(f"Alter's brain is offline, trying again in {breaker.retry_in():.0f}s")
+
+        started = False
+        try:
+            for chunk in with_token_timeouts(make_stream(), first_token_timeout, inter_token_timeout):
+                started = True
+                yield chunk
+        except GeneratorExit:
+            # The caller stopped reading (the governor had enough), the reply itself worked
+            if breaker is not None:
+                breaker.record_success()
+            raise
+        except Exception as e:
+            metrics.incr("generation_failures")
+            if breaker is not None:
+                breaker.record_failure()
+            # Tokens already went out, so a retry would repeat them
+            if started or attempt >= retries or not is_retryable(e):
+                if isinstance(e, GenerationError):
+                    raise
+                raise GenerationError(f"Generation failed: {e}") from e
+            metrics.incr("generation_retries")
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+            continue
+        except BaseException:
+            if breaker is not None:
+                breaker.abandon()
+            raise
+
+        if breaker is not None:
+            breaker.record_success()
+        return
@@ -0,0 +1,72 @@
+"""
+Author: Nicolas Fecko
+
+Description: Response cache for Alter. The same question in the same language with the same persona
+gets the stored answer instead of a full generation. Entries expire after a TTL and the least
+recently used ones are evicted once the cache is full.
+"""
+# --- imports ---
+import re       # For normalizing questions and splitting answers into tokens
+import threading    # The cache is shared between generation threads
+import time     # For TTL and latency savings
+from collections import OrderedDict # For LRU order
+from metrics import metrics     # Shared metrics registry
+
+CACHE_MAX_ENTRIES = 256 # How many answers are kept
+CACHE_TTL = 24 * 3600   # Seconds an answer stays valid
+
+
+# "Who made you?!" and "who  made you" end up as the same key
+def normalize_input(text):
+    text = text.lower()
+    text = re.sub(r"[^\w\s]", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+# Splits a cached answer back into word-sized tokens, whitespace stays attached
+def split_tokens(text):
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class ResponseCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()    # key -> (reply, stored_at, generation_seconds)
+        self.lock = threading.Lock()
+
+    def make_key(self, user_input, language, persona_version, owner=None):
+        # owner keeps users apart when one cache serves several of them (server mode)
+        return (owner, normalize_input(user_input), language, persona_version)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                del self.entries[key]
+                metrics.incr("response_cache_expired")
+                entry = None
+            if entry is None:
+                metrics.incr("response_cache_misses")
+                return None
+            self.entries.move_to_end(key)
+        metrics.incr("response_cache_hits")
+        return entry
+
+    def put(self, key, reply, generation_seconds):
+        if not key[0] or not reply:
+            return
+        with self.lock:
+            self.entries[key] = (reply, time.monotonic(), generation_seconds)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                metrics.incr("response_cache_evictions")
+
+    def replay(self, entry, on_token):
+        # Streams a cached answer through the same on_token path as a real generation
+        reply, _, generation_seconds = entry
+        started = time.perf_counter()
+        for token in split_tokens(reply):
+            on_token(token)
+        metrics.observe("response_cache_saved_s", max(0.0, generation_seconds - (time.perf_counter() - started)))
+        return reply
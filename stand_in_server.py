@@ -0,0 +1,182 @@
+"""
+Author: Nicolas Fecko
+
+Description: A tiny stand-in for an Ollama server. It speaks just enough of the Ollama HTTP API
+(/api/version, /api/tags, /api/ps and streaming /api/generate) to test the backend pool,
+failover and the rest of Alter without a real model or GPU.
+
+Usage:
+    python stand_in_server.py --port 11435 --models gemma3:4b --token-delay 0.02
+"""
+# --- imports ---
+import argparse # For command line options
+import json     # For the request / response bodies
+import threading    # For counting requests across handler threads
+import time     # For simulated generation speed
+from datetime import datetime, timezone   # For created_at stamps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "Hello from the stand-in server! I am not a real model, but I try my best."
+
+
+class StandInState:
+    def __init__(self, models, reply=DEFAULT_REPLY, token_delay=0.02, prefill_delay=0.05):
+        self.models = list(models)
+        self.reply = reply
+        self.token_delay = token_delay      # seconds per generated token
+        self.prefill_delay = prefill_delay  # seconds before the first token
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.total_requests = 0
+
+
+def now_stamp():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass  # keep the console quiet
+
+        def send_json(self, payload, status=200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_json(self):
+            length = int(self.headers.get("Content-Length", 0) or 0)
+            if not length:
+                return {}
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path == "/api/version":
+                self.send_json({"version": "0.0.0-stand-in"})
+            elif self.path == "/api/tags":
+                self.send_json({"models": [{"name": m, "model": m, "size": 0} for m in state.models]})
+            elif self.path == "/api/ps":
+                self.send_json({"models": [{"name": m, "model": m, "size": 0, "size_vram": 0} for m in state.models]})
+            elif self.path == "/":
+                self.send_json({"status": "Ollama is running", "in_flight": state.in_flight})
+            else:
+                self.send_json({"error": "not found"}, status=404)
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self.send_json({"error": "not found"}, status=404)
+                return
+            request = self.read_json()
+            model = request.get("model", "")
+            if model not in state.models:
+                self.send_json({"error": f"model '{model}' not found"}, status=404)
+                return
+
+            with state.lock:
+                state.in_flight += 1
+                state.total_requests += 1
+            try:
+                self.generate(request)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # the client hung up mid stream, just like cancelling in Ollama
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+        def generate(self, request):
+            model = request["model"]
+            prompt = request.get("prompt") or ""
+            options = request.get("options") or {}
+            limit = options.get("num_predict", -1)
+            stop = options.get("stop") or []
+
+            tokens = [w + " " for w in state.reply.split(" ")]
+            tokens[-1] = tokens[-1].rstrip()
+            if limit is not None and limit >= 0:
+                tokens = tokens[:limit]
+
+            start = time.perf_counter()
+            time.sleep(state.prefill_delay)
+            prefill_ns = int((time.perf_counter() - start) * 1e9)
+            prompt_tokens = max(1, len(prompt.split()))
+            context = list(request.get("context") or []) + list(range(prompt_tokens))
+
+            def final_chunk(eval_ns, count, reason="stop"):
+                return {
+                    "model": model, "created_at": now_stamp(), "response": "", "done": True,
+                    "done_reason": reason, "context": context + list(range(count)),
+                    "total_duration": prefill_ns + eval_ns, "load_duration": 0,
+                    "prompt_eval_count": prompt_tokens, "prompt_eval_duration": prefill_ns,
+                    "eval_count": count, "eval_duration": eval_ns,
+                }
+
+            if not request.get("stream", True):
+                time.sleep(state.token_delay * len(tokens))
+                payload = final_chunk(int(state.token_delay * len(tokens) * 1e9), len(tokens))
+                payload["response"] = "".join(tokens)
+                self.send_json(payload)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def write_line(payload):
+                data = (json.dumps(payload) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            eval_start = time.perf_counter()
+            sent = ""
+            count = 0
+            reason = "stop"
+            for token in tokens:
+                if any(s in sent + token for s in stop):
+                    break
+                time.sleep(state.token_delay)
+                write_line({"model": model, "created_at": now_stamp(), "response": token, "done": False})
+                sent += token
+                count += 1
+            else:
+                if limit is not None and 0 <= limit < len(state.reply.split(" ")):
+                    reason = "length"
+            write_line(final_chunk(int((time.perf_counter() - eval_start) * 1e9), count, reason))
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_stand_in(port=0, models=("gemma3:4b",), host="127.0.0.1", **kwargs):
+    # Starts the server in a daemon thread and returns (server, url), port 0 picks a free port
+    state = StandInState(models, **kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in Ollama server for testing Alter")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", nargs="+", default=["gemma3:4b"])
+    parser.add_argument("--reply", default=DEFAULT_REPLY)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--prefill-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(
+        StandInState(args.models, args.reply, args.token_delay, args.prefill_delay)))
+    print(f"Stand-in Ollama listening on http://{args.host}:{args.port} with models {args.models}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
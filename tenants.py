@@ -0,0 +1,97 @@
+"""
+Author: Nicolas Fecko
+
+Description: Tenant registry for serving many users from one process. Every user gets their own engine
+(memory, settings, language) and their own lock, loaded on first use. Only a limited number stay in
+memory: the least recently used idle ones are dropped, their history is on disk anyway and is loaded
+again the next time they write.
+"""
+# --- imports ---
+import threading    # Registry and per user locks
+import time     # For idle times
+from collections import OrderedDict # For LRU order
+from contextlib import contextmanager   # For use()
+from metrics import metrics     # Shared metrics registry
+
+MAX_RESIDENT = 200      # users kept loaded at once
+IDLE_TIMEOUT = 15 * 60  # seconds before an unused user is dropped anyway
+SWEEP_INTERVAL = 60     # seconds between idle sweeps
+
+
+class Tenant:
+    def __init__(self, user):
+        self.user = user
+        self.engine = None
+        self.lock = threading.Lock()        # one turn at a time for this user, nobody else waits on it
+        self.load_lock = threading.Lock()   # only this user waits while their memory is read
+        self.users = 0                      # requests using the tenant right now, never evicted while > 0
+        self.last_used = time.monotonic()
+
+
+class TenantRegistry:
+    def __init__(self, factory, max_resident=MAX_RESIDENT, idle_timeout=IDLE_TIMEOUT):
+        self.factory = factory      # user -> engine
+        self.max_resident = max_resident
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()    # guards the dict only, never held while loading
+        self.tenants = OrderedDict()    # user -> Tenant, least recently used first
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    @contextmanager
+    def use(self, user):
+        # with registry.use("alice") as tenant: ... tenant.engine, tenant.lock
+        with self.lock:
+            tenant = self.tenants.get(user)
+            if tenant is None:
+                tenant = self.tenants[user] = Tenant(user)
+            self.tenants.move_to_end(user)
+            tenant.users += 1
+        try:
+            with tenant.load_lock:
+                if tenant.engine is None:
+                    tenant.engine = self.factory(user)
+                    metrics.incr("tenant_loads")
+            yield tenant
+        finally:
+            with self.lock:
+                tenant.users -= 1
+                tenant.last_used = time.monotonic()
+                self._evict_over_limit()
+
+    def __len__(self):
+        return len(self.tenants)
+
+    # --- Eviction ---
+    def _evict(self, user):
+        del self.tenants[user]
+        metrics.incr("tenant_evictions")
+
+    def _evict_over_limit(self):
+        # Caller holds self.lock. Oldest idle tenants go first, busy ones are skipped
+        if len(self.tenants) <= self.max_resident:
+            return
+        for user, tenant in list(self.tenants.items()):
+            if len(self.tenants) <= self.max_resident:
+                break
+            if tenant.users == 0:
+                self._evict(user)
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self.lock:
+            for user, tenant in list(self.tenants.items()):
+                if tenant.users == 0 and now - tenant.last_used > self.idle_timeout:
+                    self._evict(user)
+
+    def start_sweeper(self, interval=SWEEP_INTERVAL):
+        def loop():
+            while not self._stop.wait(interval):
+                self.evict_idle()
+
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=loop, daemon=True)
+            self._sweeper.start()
+
+    def stop(self):
+        self._stop.set()
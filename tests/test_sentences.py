@@ -0,0 +1,41 @@
+from governor import Governor
+from token_bus import SentenceSegmenter
+
+
+def segment(tokens):
+    sentences = []
+    segmenter = SentenceSegmenter(sentences.append)
+    for token in tokens:
+        segmenter.feed([token])
+    streamed = list(sentences)
+    segmenter.flush()
+    return streamed, sentences
+
+
+def test_segmenter_splits_on_whitespace_after_ascii_punctuation():
+    streamed, sentences = segment(["Hello there. ", "It costs 3.5 euros! ", "Right?"])
+    assert streamed == ["Hello there.", "It costs 3.5 euros!"]
+    assert sentences == streamed + ["Right?"]
+
+
+def test_segmenter_splits_cjk_without_spaces():
+    streamed, sentences = segment(["你好。", "我是Alter。", "你呢？"])
+    assert streamed == ["你好。", "我是Alter。", "你呢？"]
+    assert sentences == streamed
+
+
+def test_governor_stops_after_budget():
+    governor = Governor(sentence_budget=2)
+    out, enough = governor.feed("One. ")
+    assert not enough
+    out, enough = governor.feed("Two. Three. ")
+    assert enough
+    assert out == "Two."
+
+
+def test_governor_counts_cjk_sentences():
+    governor = Governor(sentence_budget=2)
+    assert governor.feed("你好。")[1] is False
+    out, enough = governor.feed("我是Alter。你呢？")
+    assert enough
+    assert out == "我是Alter。"
@@ -0,0 +1,163 @@
+import json
+import socket
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from alter_engine import AlterEngine
+from alter_server import AlterHTTPServer, AlterService, make_handler
+from backend_pool import BackendPool
+from fair_queue import FairQueue
+from model_router import ModelRouter, default_routes
+from stand_in_server import start_stand_in
+
+
+@pytest.fixture
+def stand_ins():
+    # Two stand-in Ollama servers, fast enough for tests but slow enough to overlap
+    started = []
+
+    def start(count=2, **kwargs):
+        kwargs.setdefault("models", ("gemma3:4b", "gemma3:1b"))
+        kwargs.setdefault("token_delay", 0.01)
+        kwargs.setdefault("prefill_delay", 0.01)
+        for _ in range(count):
+            started.append(start_stand_in(**kwargs))
+        return started
+
+    yield start
+    for server, _ in started:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def in_tmp(tmp_path, monkeypatch):
+    # Engines write memory, settings and metrics.json into the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def dead_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+# --- Backend pool ---
+def test_pool_spreads_concurrent_requests(stand_ins):
+    servers = stand_ins()
+    pool = BackendPool([url for _, url in servers])
+    pool.check_all()    # both hosts report the model as loaded
+    streams = [pool.generate("gemma3:4b", "hi", stream=True) for _ in range(2)]
+    for stream in streams:
+        next(stream)    # both requests are running now
+    assert [server.state.in_flight for server, _ in servers] == [1, 1]
+    for stream in streams:
+        list(stream)
+    assert all(b["in_flight"] == 0 for b in pool.status())
+
+
+def test_pool_spills_over_from_a_warm_host(stand_ins):
+    # No health check yet, the first reply makes host A the only one with the model loaded
+    servers = stand_ins()
+    pool = BackendPool([url for _, url in servers])
+    streams = [pool.generate("gemma3:4b", "hi", stream=True) for _ in range(3)]
+    for stream in streams:
+        next(stream)
+    assert sorted(server.state.in_flight for server, _ in servers) == [1, 2]
+    for stream in streams:
+        list(stream)
+
+
+def test_pool_fails_over_to_a_live_host(stand_ins):
+    (server, url), = stand_ins(count=1)
+    pool = BackendPool([dead_url(), url])
+    chunks = list(pool.generate("gemma3:4b", "hi", stream=True))
+    assert chunks[-1]["done"]
+    assert [b["healthy"] for b in pool.status()] == [False, True]
+    assert server.state.total_requests == 1
+
+
+def test_missing_model_is_remembered(stand_ins):
+    servers = stand_ins()
+    pool = BackendPool([url for _, url in servers])
+    asked = []
+    for backend in pool.backends:
+        generate = backend.client.generate
+
+        def counting(*args, _generate=generate, **kwargs):
+            asked.append(kwargs["model"])
+            return _generate(*args, **kwargs)
+
+        backend.client.generate = counting
+    router = ModelRouter(default_routes("gemma3:4b", "gemma3:1b"), "gemma3:4b")
+    slovak = default_routes("gemma3:4b", "gemma3:1b")["languages"]["Slovak"]["chat"]
+
+    for _ in range(3):
+        chunks = list(router.generate(pool, "chat", "Slovak", prompt="Ahoj"))
+        assert chunks[-1]["model"] == "gemma3:4b"
+    assert asked.count(slovak) == 2     # once per host, then straight to the fallback
+    assert asked.count("gemma3:4b") == 3
+
+
+# --- Governor ---
+def test_governor_cuts_the_reply_and_closes_the_breaker(stand_ins, in_tmp):
+    (_, url), = stand_ins(count=1, reply="One. Two. Three. Four. Five.")
+    with open("settings.json", "w") as f:
+        json.dump({"ollama_hosts": [url], "sentence_budget": 2}, f)
+    engine = AlterEngine(memory_file="memory.json", settings_file="settings.json", voice=False)
+    breaker = engine.backend.breaker
+    breaker.state, breaker.failures, breaker.opened_at = "open", 3, 0.0    # an outage just ended
+
+    tokens = []
+    reply, final = engine.generate_reply("User: count\nAI:", "English", tokens.append)
+    assert reply == "One. Two."
+    assert final is None    # stopped before the server was done
+    assert (breaker.state, breaker.failures) == ("closed", 0)
+
+
+# --- Fair queue ---
+def test_fair_queue_gives_a_user_one_slot():
+    queue = FairQueue(max_active=2)
+    a1, a2, b1 = queue.enqueue("a"), queue.enqueue("a"), queue.enqueue("b")
+    assert (a1.granted, a2.granted, b1.granted) == (True, False, True)
+    c1 = queue.enqueue("c")
+    queue.release(a1)
+    assert (a2.granted, c1.granted) == (False, True)    # a just had a turn
+    queue.release(b1)
+    assert a2.granted
+
+
+def test_server_runs_one_generation_per_user(stand_ins, in_tmp):
+    (_, url), = stand_ins(count=1)
+    service = AlterService({"ollama_hosts": [url], "server_max_active": 2}, str(in_tmp / "users"))
+    server = AlterHTTPServer(("127.0.0.1", 0), make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    bodies = []
+
+    def chat(message):
+        request = urllib.request.Request(
+            base + "/chat",
+            data=json.dumps({"user": "alice", "message": message}).encode("utf-8"),
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            bodies.append(response.read().decode("utf-8"))
+
+    threads = [threading.Thread(target=chat, args=(f"hi {i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    most_active = 0
+    while any(thread.is_alive() for thread in threads):
+        most_active = max(most_active, service.queue.active)
+        time.sleep(0.002)
+    server.shutdown()
+    server.server_close()
+
+    assert len(bodies) == 3 and all("event: done" in body for body in bodies)
+    assert most_active == 1     # the other two waited in line, not in a slot
@@ -0,0 +1,187 @@
+"""
+Author: Nicolas Fecko
+
+Description: Token bus for Alter. Generation publishes tokens once and every consumer (chat view, TTS,
+partial reply saving, metrics) gets them in its own thread, with its own batching and backpressure,
+so nobody waits for the full reply and a slow consumer does not slow the model down.
+"""
+# --- imports ---
+import json     # For the partial reply file
+import os       # For removing the partial reply file
+import re       # For sentence splitting
+import threading    # Every subscriber runs in its own thread
+import time     # For first token / tokens per second timing
+from datetime import datetime   # For timestamps
+from metrics import metrics     # Shared metrics registry
+
+PARTIAL_REPLY_FILE = "partial_reply.json"   # Reply in progress, survives a crash mid generation
+# End of a sentence: ". ! ? …" need whitespace after them (so 3.5 does not split), the full width
+# "。！？" of Chinese and Japanese are never followed by a space
+SENTENCE_END = re.compile(r'[.!?…]+["\')\]]*\s|[。！？]+[」』"\')\]]*')
+
+
+# --- One consumer ---
+class Subscription:
+    def __init__(self, name, callback, batch_size=1, max_delay=0.0, max_pending=4096, block=False, on_close=None):
+        self.name = name
+        self.callback = callback        # gets a list of tokens, the same str objects the bus got
+        self.batch_size = batch_size    # deliver once this many tokens are waiting...
+        self.max_delay = max_delay      # ...or once the oldest waiting token is this old
+        self.max_pending = max_pending  # backpressure limit
+        self.block = block              # True: publisher waits when full, False: tokens are dropped
+        self.on_close = on_close
+        self.pending = []
+        self.closed = False
+        self.dropped = 0
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name=f"bus-{name}", daemon=True)
+
+    def push(self, token):
+        with self.cond:
+            if len(self.pending) >= self.max_pending:
+                if not self.block:
+                    self.dropped += 1
+                    return
+                self.cond.wait_for(lambda: len(self.pending) < self.max_pending or self.closed)
+            self.pending.append(token)
+            if len(self.pending) >= self.batch_size:
+                self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending or self.closed)
+                if self.max_delay and not self.closed and len(self.pending) < self.batch_size:
+                    # Let a batch build up, but never hold tokens longer than max_delay
+                    self.cond.wait_for(lambda: len(self.pending) >= self.batch_size or self.closed, timeout=self.max_delay)
+                batch, self.pending = self.pending, []
+                finished = self.closed
+                self.cond.notify_all()  # wake a blocked publisher
+
+            if batch:
+                try:
+                    self.callback(batch)
+                except Exception as e:
+                    print(f"[token bus] {self.name} consumer failed: {e}")
+            if finished:
+                with self.cond:
+                    if self.pending:
+                        continue
+                if self.on_close:
+                    try:
+                        self.on_close()
+                    except Exception as e:
+                        print(f"[token bus] {self.name} close failed: {e}")
+                return
+
+
+# --- The bus ---
+class TokenBus:
+    def __init__(self):
+        self.chunks = []    # every token in order, joined only once when someone asks for the text
+        self.subscribers = []
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.closed = False
+        self.turn = None    # set by the engine, names the turn in events
+
+    def subscribe(self, name, callback, **kwargs):
+        sub = Subscription(name, callback, **kwargs)
+        self.subscribers.append(sub)
+        sub.thread.start()
+        return sub
+
+    def publish(self, token):
+        if not token:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks.append(token)
+        for sub in self.subscribers:
+            sub.push(token)
+
+    def text(self):
+        return "".join(self.chunks)
+
+    def close(self):
+        self.closed = True
+        for sub in self.subscribers:
+            sub.close()
+
+    def join(self, timeout=None, names=None):
+        for sub in self.subscribers:
+            if names is None or sub.name in names:
+                sub.thread.join(timeout)
+
+
+# --- Stages ---
+class SentenceSegmenter:
+    # Collects tokens and hands every finished sentence to on_sentence, the rest on flush()
+    def __init__(self, on_sentence):
+        self.on_sentence = on_sentence
+        self.buffer = []
+
+    def feed(self, tokens):
+        self.buffer.extend(tokens)
+        text = "".join(self.buffer)
+        last = 0
+        for match in SENTENCE_END.finditer(text):
+            sentence = text[last:match.end()].strip()
+            if sentence:
+                self.on_sentence(sentence)
+            last = match.end()
+        if last:
+            self.buffer = [text[last:]]
+
+    def flush(self):
+        rest = "".join(self.buffer).strip()
+        self.buffer = []
+        if rest:
+            self.on_sentence(rest)
+
+
+class PartialReplyWriter:
+    # Saves the reply in progress every so often, removed again once the reply is done
+    def __init__(self, user_input, path=PARTIAL_REPLY_FILE):
+        self.user_input = user_input
+        self.path = path
+        self.chunks = []
+
+    def write(self, tokens):
+        self.chunks.extend(tokens)
+        with open(self.path, "w") as f:
+            json.dump({
+                "user": self.user_input,
+                "assistant": "".join(self.chunks),
+                "timestamp": datetime.now().isoformat()
+            }, f, indent=2)
+
+    def finish(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class StreamMetrics:
+    # Time to first token and tokens per second for one reply
+    def __init__(self, bus):
+        self.bus = bus
+        self.tokens = 0
+
+    def count(self, tokens):
+        self.tokens += len(tokens)
+
+    def finish(self):
+        bus = self.bus
+        metrics.incr("replies")
+        metrics.incr("tokens", self.tokens)
+        if bus.first_token_at is None:
+            return
+        metrics.observe("first_token_s", bus.first_token_at - bus.started_at)
+        elapsed = time.perf_counter() - bus.first_token_at
+        if elapsed > 0 and self.tokens > 1:
+            metrics.observe("tokens_per_s", (self.tokens - 1) / elapsed)
@@ -0,0 +1,400 @@
+"""
+Author: Nicolas Fecko
+
+Description: Voice output for Alter. gTTS renders the speech into memory (needs internet) and one long running
+mpg123 plays it from its stdin, so there are no temporary files and no shell. Sentences are queued as soon as
+they are finished and go through a small pipeline: the next few sentences are rendered at the same time while
+the current one plays, and they are played strictly in the order they were queued. The first sentence is heard
+while the model is still writing, and a long reply waits for its slowest sentence instead of the sum of them.
+Replies go before greetings, and a new message from the user cuts off whatever is still being said (barge-in),
+nothing from the old reply is played after that. Rendered audio is kept in the audio cache (tts_cache.py), so
+phrases heard before play at once, even offline.
+
+Two engines: gTTS sounds better, pyttsx3 works offline and starts speaking sooner. "tts_engine" in settings
+picks one: "auto" (default) uses gTTS and falls back to pyttsx3 while the network is down, "gtts" or "pyttsx3"
+always use that one. Languages gTTS does not have (Irish, Hebrew, ...) always go to pyttsx3. pyttsx3 speaks
+directly, so its audio does not go through the player or the cache. It is only started the first time a voice is
+picked, so importing this never touches audio, and its voices are indexed by language once.
+"""
+# --- imports ---
+import io   # gTTS renders into memory
+import itertools    # FIFO order inside one priority
+import queue    # Between the render and the play thread
+import subprocess   # For the player process
+import threading    # The offline engine is created once, the pipeline runs in the background
+import time     # For time to first audio
+from concurrent.futures import ThreadPoolExecutor, wait  # Renders several sentences at once
+import pyttsx3 # For Voice Offline voice version
+import requests # gTTS's HTTP library, for telling network errors apart
+from gtts import gTTS # Google Voice - Needs a stable Internet Conection
+from gtts.lang import tts_langs # Languages gTTS can speak, no network needed
+from gtts.tts import gTTSError # Raised when Google can't be reached
+from metrics import metrics # For time to first audio
+from tts_cache import cache_key # For looking up audio rendered before
+
+TTS_RATE = 160      # words per minute
+TTS_VOLUME = 0.9    # 0.0 to 1.0
+LOOKAHEAD = 3       # sentences rendered ahead of the one playing
+PLAYER_COMMAND = ["mpg123", "-q", "-"]  # reads mp3 from stdin until it is closed
+TTS_ENGINES = ("auto", "gtts", "pyttsx3")
+OFFLINE_RETRY_S = 60    # after gTTS fails, how long "auto" stays offline before trying it again
+GTTS_TIMEOUT = 10       # seconds per request to Google, without one a dead network hangs the renderers
+
+# Lower goes first
+PRIORITY_REPLY = 0
+PRIORITY_GREETING = 1
+
+_offline_engine = None
+_offline_lock = threading.Lock()
+_voice_lock = threading.Lock()  # the offline engine is used by one thread at a time
+_voice_index = None     # language tag -> voice id, built on first use
+_gtts_languages = None
+
+
+# Initialize text-to-speech engine
+def get_offline_engine():
+    global _offline_engine
+    with _offline_lock:
+        if _offline_engine is None:
+            _offline_engine = pyttsx3.init()
+            _offline_engine.setProperty('rate', TTS_RATE)
+            _offline_engine.setProperty('volume', TTS_VOLUME)
+        return _offline_engine
+
+def build_voice_index(voices):
+    # "en-us" and "en" both point at the first voice for that language, "" at the first voice of all
+    index = {}
+    for voice in voices:
+        for lang in getattr(voice, "languages", None) or []:
+            # voice.languages is usually a list of bytes like [b'\x05en-us']
+            tag = lang.decode("utf-8", "ignore") if isinstance(lang, bytes) else str(lang)
+            tag = "".join(c for c in tag.lower().replace("_", "-") if c.isalnum() or c == "-")
+            if tag:
+                index.setdefault(tag, voice.id)
+                index.setdefault(tag.split("-")[0], voice.id)
+    if voices:
+        index.setdefault("", voices[0].id)
+    return index
+
+def voice_for(language_code):
+    # Caller holds _voice_lock
+    global _voice_index
+    if _voice_index is None:
+        _voice_index = build_voice_index(get_offline_engine().getProperty("voices") or [])
+    code = language_code.lower()
+    return _voice_index.get(code) or _voice_index.get(code.split("-")[0]) or _voice_index.get("")
+
+# Map language codes to pyttsx3-compatible voices
+def set_tts_voice(language_code):
+    with _voice_lock:
+        try:
+            voice = voice_for(language_code)
+        except Exception as e:
+            print(f"[tts] no offline voice engine: {e}")
+            return
+        if voice:
+            get_offline_engine().setProperty("voice", voice)
+
+def speak_offline(text, language_code="en"):
+    # Blocks until it has been said
+    with _voice_lock:
+        tts_engine = get_offline_engine()
+        voice = voice_for(language_code)
+        if voice:
+            tts_engine.setProperty("voice", voice)
+        tts_engine.say(text)
+        tts_engine.runAndWait()
+
+def stop_offline():
+    # From another thread, cuts speak_offline() short
+    if _offline_engine is not None:
+        try:
+            _offline_engine.stop()
+        except Exception:
+            pass
+
+def gtts_supports(language_code):
+    global _gtts_languages
+    if _gtts_languages is None:
+        _gtts_languages = set(tts_langs())
+    return language_code in _gtts_languages
+
+def render_audio(text, language_code="en"):
+    buffer = io.BytesIO()
+    gTTS(text=text, lang=language_code, timeout=GTTS_TIMEOUT).write_to_fp(buffer)
+    return buffer.getvalue()
+
+def render_message(text, language_code="en", cache=None, online=True):
+    # The mp3 bytes, from the audio cache when it was said before. Offline a cache miss is None
+    key = cache_key(text, language_code, "gtts") if cache is not None else None
+    if key is not None:
+        data = cache.get(key)
+        if data is not None:
+            metrics.incr("tts_cache_hits")
+            return data
+        metrics.incr("tts_cache_misses")
+    if not online:
+        return None
+
+    data = render_audio(text, language_code)
+    if key is not None:
+        cache.put(key, data)
+    return data
+
+
+# --- MP3 length ---
+# Layer III only, that is what gTTS produces
+BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+VERSIONS = {0b00: 2.5, 0b10: 2, 0b11: 1}
+
+def mp3_duration(data):
+    # Seconds of audio, walks the frame headers so it is right for VBR too
+    pos = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        pos = 10 + size
+    seconds = 0.0
+    while pos + 4 <= len(data):
+        header = int.from_bytes(data[pos:pos + 4], "big")
+        version = VERSIONS.get((header >> 19) & 0b11)
+        bitrate_index = (header >> 12) & 0xF
+        rate_index = (header >> 10) & 0b11
+        if (header >> 21) != 0x7FF or version is None or (header >> 17) & 0b11 != 0b01 \
+                or bitrate_index in (0, 15) or rate_index == 3:
+            pos += 1    # not a frame header, look further
+            continue
+        bitrate = BITRATES[1 if version == 1 else 2][bitrate_index] * 1000
+        sample_rate = SAMPLE_RATES[version][rate_index]
+        samples = 1152 if version == 1 else 576
+        padding = (header >> 9) & 1
+        pos += samples // 8 * bitrate // sample_rate + padding
+        seconds += samples / sample_rate
+    return seconds
+
+
+# --- Player ---
+class AudioPlayer:
+    # One mpg123 for the whole app, every clip is written to its stdin
+    def __init__(self, command=PLAYER_COMMAND):
+        self.command = command
+        self.process = None
+        self.cond = threading.Condition()
+        self.busy_until = 0.0   # monotonic time the audio written so far ends
+        self.generation = 0     # bumped by stop(), wakes play() early
+        self.missing = False
+
+    def _process(self):
+        with self.cond:
+            if self.missing:
+                return None
+            if self.process is None or self.process.poll() is not None:
+                try:
+                    self.process = subprocess.Popen(
+                        self.command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                    )
+                except FileNotFoundError:
+                    self.missing = True
+                    print(f"[tts] {self.command[0]} is not installed, voice output is off")
+                    return None
+                self.busy_until = 0.0
+            return self.process
+
+    def play(self, data):
+        # Returns once the clip has been heard or stop() was called, the next one can be written right away
+        # and follows gaplessly
+        if not data:
+            return
+        generation = self.generation
+        for attempt in range(2):
+            process = self._process()
+            if process is None:
+                return
+            try:
+                # Outside the lock, a clip bigger than the pipe buffer blocks here and stop() must still get in
+                process.stdin.write(data)
+                process.stdin.flush()
+                break
+            except OSError:
+                if generation != self.generation:
+                    return  # killed by stop()
+                with self.cond:
+                    if self.process is process:
+                        self.process = None     # the player died, start a new one once
+        else:
+            return
+        with self.cond:
+            self.busy_until = max(time.monotonic(), self.busy_until) + mp3_duration(data)
+            self.cond.wait_for(
+                lambda: generation != self.generation or time.monotonic() >= self.busy_until,
+                timeout=max(0.0, self.busy_until - time.monotonic())
+            )
+
+    def stop(self):
+        # Cuts off what is playing now, mpg123 has it buffered so the process has to go. The next play()
+        # starts a new one. When nothing is playing the process stays
+        with self.cond:
+            process = None
+            if time.monotonic() < self.busy_until:
+                process, self.process = self.process, None
+            self.generation += 1
+            self.busy_until = 0.0
+            self.cond.notify_all()
+        if process is not None:
+            process.kill()
+            process.wait()
+
+    def close(self):
+        with self.cond:
+            process, self.process = self.process, None
+            self.busy_until = 0.0
+        if process is not None:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+
+# Shared by everything that speaks, so there is only ever one player process
+player = AudioPlayer()
+
+
+# --- Sentence pipeline ---
+class Utterance:
+    def __init__(self, text, language_code, since=None, priority=PRIORITY_REPLY, epoch=0):
+        self.text = text
+        self.language_code = language_code
+        self.since = since      # perf_counter of the turn start, for time to first audio
+        self.priority = priority
+        self.epoch = epoch      # pipeline epoch when queued, older ones were interrupted
+        self.audio = None       # mp3 for the player, None is spoken by the offline engine
+        self.error = None
+
+
+class SpeechPipeline:
+    # say() returns at once, up to lookahead sentences are rendered in parallel and played in order of priority,
+    # then in the order they were said. interrupt() drops everything queued and stops the audio
+    def __init__(self, on_start=None, on_end=None, lookahead=LOOKAHEAD, cache=None, audio_player=None, engine="auto"):
+        self.on_start = on_start    # on_start(text) right before a sentence is heard
+        self.on_end = on_end
+        self.cache = cache          # AudioCache or None
+        self.player = audio_player or player
+        self.engine = engine if engine in TTS_ENGINES else "auto"
+        self.offline_until = 0.0    # "auto" skips gTTS until then
+        self.render_queue = queue.PriorityQueue()  # (priority, order, utterance)
+        # (utterance, future) in playback order, the dispatcher waits here so it never runs far ahead
+        self.play_queue = queue.Queue(maxsize=lookahead)
+        self.renderers = ThreadPoolExecutor(max_workers=lookahead + 1, thread_name_prefix="tts-render")
+        self.order = itertools.count()
+        self.epoch = 0
+        self.lock = threading.Lock()
+        self.started = False
+
+    def start(self):
+        with self.lock:
+            if not self.started:
+                self.started = True
+                threading.Thread(target=self._dispatch_loop, name="tts-dispatch", daemon=True).start()
+                threading.Thread(target=self._play_loop, name="tts-play", daemon=True).start()
+
+    def say(self, text, language_code="en", since=None, priority=PRIORITY_REPLY, epoch=None):
+        # epoch: the one the turn started in, sentences of an interrupted turn are dropped even if they come late
+        if not text:
+            return
+        self.start()
+        utterance = Utterance(text, language_code, since, priority, self.epoch if epoch is None else epoch)
+        self.render_queue.put((priority, next(self.order), utterance))
+
+    def interrupt(self):
+        # Barge-in, never waits for the worker threads
+        with self.lock:
+            if not self.started:
+                return
+            self.epoch += 1
+        for q in (self.render_queue, self.play_queue):
+            while True:
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+                if q is self.play_queue:
+                    item[1].cancel()    # not rendered yet, never will be
+                q.task_done()
+                metrics.incr("tts_dropped")
+        # Whatever the threads hold right now is stale and gets dropped by them
+        self.player.stop()
+        stop_offline()
+        metrics.incr("tts_interrupts")
+
+    def close(self):
+        # On exit, the player finishes what it already has and quits
+        self.player.close()
+
+    def stale(self, utterance):
+        if utterance.epoch != self.epoch:
+            metrics.incr("tts_dropped")
+            return True
+        return False
+
+    def render(self, utterance):
+        # Fills utterance.audio, or leaves it None for the offline engine
+        if self.engine == "pyttsx3" or not gtts_supports(utterance.language_code):
+            return
+        online = self.engine == "gtts" or time.monotonic() >= self.offline_until
+        try:
+            utterance.audio = render_message(utterance.text, utterance.language_code, self.cache, online)
+        except (gTTSError, requests.RequestException) as e:
+            if self.engine == "gtts":
+                raise
+            if time.monotonic() >= self.offline_until:
+                print(f"[tts] gTTS failed, using the offline voice for {OFFLINE_RETRY_S}s: {e}")
+            self.offline_until = time.monotonic() + OFFLINE_RETRY_S
+            metrics.incr("tts_offline_fallbacks")
+
+    def _render(self, utterance):
+        # Runs in the render pool
+        try:
+            self.render(utterance)
+        except Exception as e:
+            utterance.error = e
+
+    def _dispatch_loop(self):
+        # The order sentences leave the priority queue is the order they are heard, rendering is parallel
+        while True:
+            _, _, utterance = self.render_queue.get()
+            if self.stale(utterance):
+                self.render_queue.task_done()
+                continue
+            self.play_queue.put((utterance, self.renderers.submit(self._render, utterance)))
+            self.render_queue.task_done()
+
+    def _play_loop(self):
+        while True:
+            utterance, future = self.play_queue.get()
+            try:
+                # Waits for the render, a barge-in gives up on it right away
+                while utterance.epoch == self.epoch and not wait([future], timeout=0.05).done:
+                    pass
+                if self.stale(utterance) or future.cancelled():
+                    future.cancel()
+                    continue
+                if utterance.error is not None:
+                    print(f"[tts] speaking failed: {utterance.error}")
+                    continue
+                if utterance.since is not None:
+                    metrics.observe("first_audio_s", time.perf_counter() - utterance.since)
+                if self.on_start:
+                    self.on_start(utterance.text)
+                if utterance.audio is not None:
+                    self.player.play(utterance.audio)
+                else:
+                    speak_offline(utterance.text, utterance.language_code)
+                if self.on_end:
+                    self.on_end(utterance.text)
+            except Exception as e:
+                print(f"[tts] playback failed: {e}")
+            finally:
+                self.play_queue.task_done()
@@ -0,0 +1,176 @@
+"""
+Author: Nicolas Fecko
+
+Description: Audio cache for Alter's voice. Rendered speech is stored on disk under a hash of the text,
+language and engine/voice, so a phrase that was said before (greetings, new chat messages, common
+answers) plays at once and works without internet. The folder is kept under a size cap by removing
+the least recently played files first, the file times are the LRU order so it survives restarts.
+
+Usage:
+    python tts_cache.py --prerender                 # every greeting and new chat message, every language
+    python tts_cache.py --prerender --languages English Slovak
+    python tts_cache.py --stats
+"""
+# --- imports ---
+import argparse # For command line options
+import hashlib  # For the content address
+import os       # For the cache folder
+import threading    # Shared by the render threads
+import time     # For LRU times
+
+TTS_CACHE_DIR = "tts_cache"
+TTS_CACHE_MAX_MB = 200  # size cap, see "tts_cache_mb" in settings
+
+
+def cache_key(text, language_code, engine="gtts", voice=""):
+    raw = "\x00".join([engine, voice, language_code, text.strip()])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    def __init__(self, directory=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024, suffix=".mp3"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.lock = threading.Lock()
+        self.sizes = {}     # key -> bytes, filled from the folder on first use
+        self.total = 0
+        self.loaded = False
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _load(self):
+        # Caller holds self.lock
+        if self.loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                size = os.path.getsize(os.path.join(self.directory, name))
+                self.sizes[name[:-len(self.suffix)]] = size
+                self.total += size
+        self.loaded = True
+
+    def get_path(self, key):
+        # Path of the cached audio or None, a hit counts as a use for LRU
+        with self.lock:
+            self._load()
+            if key not in self.sizes:
+                return None
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self.lock:
+                self.total -= self.sizes.pop(key, 0)
+            return None
+        return path
+
+    def get(self, key):
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        # Written to a temporary name first, a half written file is never played
+        with self.lock:
+            self._load()
+        path = self.path(key)
+        partial = f"{path}.{threading.get_ident()}.part"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, path)
+        with self.lock:
+            self.total += len(data) - self.sizes.get(key, 0)
+            self.sizes[key] = len(data)
+            self._evict()
+        return path
+
+    def _evict(self):
+        # Caller holds self.lock. Least recently played go first
+        if self.total <= self.max_bytes:
+            return
+        by_age = []
+        for key in self.sizes:
+            try:
+                by_age.append((os.path.getmtime(self.path(key)), key))
+            except OSError:
+                by_age.append((0, key))
+        for _, key in sorted(by_age):
+            if self.total <= self.max_bytes:
+                break
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+            self.total -= self.sizes.pop(key)
+
+    def stats(self):
+        with self.lock:
+            self._load()
+            return {"files": len(self.sizes), "bytes": self.total, "max_bytes": self.max_bytes}
+
+
+def prerender(cache, languages=None, workers=4):
+    # Renders every greeting and new chat message into the cache, skips what is already there
+    from concurrent.futures import ThreadPoolExecutor
+    from alter_engine import GREETINGS_FILE, DEFAULT_GREETING_FILE, RESET_MESSAGES_FILE, load_json
+    from languages import LANGUAGES
+    import tts
+
+    jobs = []
+    for file_path in (DEFAULT_GREETING_FILE, GREETINGS_FILE, RESET_MESSAGES_FILE):
+        for language, phrases in load_json(file_path).items():
+            code = LANGUAGES.get(language)
+            if code is None or (languages and language not in languages) or not tts.gtts_supports(code):
+                continue
+            jobs.extend((phrase, code) for phrase in phrases)
+
+    counts = {"rendered": 0, "cached": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def render(job):
+        text, code = job
+        key = cache_key(text, code)
+        if cache.get_path(key) is not None:
+            result = "cached"
+        else:
+            try:
+                cache.put(key, tts.render_audio(text, code))
+                result = "rendered"
+            except Exception as e:
+                print(f"[tts cache] {code} {text[:40]!r}: {e}")
+                result = "failed"
+        with lock:
+            counts[result] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(render, jobs))
+    print(f"{len(jobs)} phrases: {counts['rendered']} rendered, {counts['cached']} already cached, "
+          f"{counts['failed']} failed in {time.perf_counter() - started:.1f}s")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alter's voice cache")
+    parser.add_argument("--prerender", action="store_true", help="render all greetings and new chat messages")
+    parser.add_argument("--languages", nargs="+", help="only these languages (names as in the settings)")
+    parser.add_argument("--dir", default=TTS_CACHE_DIR)
+    parser.add_argument("--max-mb", type=int, help=f"size cap (default: tts_cache_mb in settings or {TTS_CACHE_MAX_MB})")
+    parser.add_argument("--stats", action="store_true")
+    args = parser.parse_args()
+
+    from alter_engine import SETTINGS_FILE, load_json
+    max_mb = args.max_mb or load_json(SETTINGS_FILE).get("tts_cache_mb", TTS_CACHE_MAX_MB)
+    cache = AudioCache(args.dir, max_mb * 1024 * 1024)
+    if args.prerender:
+        prerender(cache, args.languages)
+    if args.stats or not args.prerender:
+        print(cache.stats())
@@ -0,0 +1,71 @@
+"""
+Author: Nicolas Fecko
+
+Description: One timer loop for the whole UI. Animations, indicators and periodic refreshes register here
+and all run from a single app.after tick on the Tk main loop, so no thread is started per message and
+Tk is never called from a background thread.
+"""
+# --- imports ---
+import time     # For due times
+from collections import deque   # For calls posted from other threads
+
+TICK_MS = 16    # about 60 ticks per second, same as a frame
+
+
+class UIScheduler:
+    def __init__(self, app, tick_ms=TICK_MS):
+        self.app = app
+        self.tick_ms = tick_ms
+        self.tasks = {}         # name -> [due, interval or None, fn]
+        self.posted = deque()   # calls from other threads, run on the next tick
+        self.counter = 0
+
+    # --- Tk main loop only ---
+    def every(self, name, interval_ms, fn, immediate=True):
+        # Runs fn every interval_ms, registering the same name again replaces the old task
+        due = time.monotonic() + (0 if immediate else interval_ms / 1000)
+        self.tasks[name] = [due, interval_ms / 1000, fn]
+
+    def after(self, delay_ms, fn, name=None):
+        # Runs fn once, a named one replaces (debounces) the previous one with that name
+        if name is None:
+            self.counter += 1
+            name = f"once{self.counter}"
+        self.tasks[name] = [time.monotonic() + delay_ms / 1000, None, fn]
+        return name
+
+    def cancel(self, name):
+        self.tasks.pop(name, None)
+
+    # --- Safe from any thread ---
+    def post(self, fn, *args):
+        self.posted.append((fn, args))
+
+    # --- The loop ---
+    def start(self):
+        self.app.after(self.tick_ms, self._tick)
+
+    def _tick(self):
+        try:
+            while self.posted:
+                fn, args = self.posted.popleft()
+                self._run(fn, *args)
+
+            now = time.monotonic()
+            for name, task in list(self.tasks.items()):
+                if task[0] > now:
+                    continue
+                if task[1] is None:
+                    if self.tasks.get(name) is task:
+                        del self.tasks[name]
+                else:
+                    task[0] = now + task[1]
+                self._run(task[2])
+        finally:
+            self.app.after(self.tick_ms, self._tick)
+
+    def _run(self, fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"[ui scheduler] {getattr(fn, '__name__', fn)} failed: {e}")